@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+classifier.py — Локальний класифікатор релевантності кандидатів (без LLM).
+
+Логістична регресія на хешованих n-грамах слів (unigram + bigram), чистий Python.
+Навчається офлайн на історії пайплайну:
+  позитивні — статті з data/workflow.json (пройшли рерайт, крім scrape_failed);
+  негативні — data/rejections.json (відхилені rewrite-моделлю або LLM-тріажем).
+Лише тексти мовою джерела (оригінальний заголовок + content_preview).
+Ймовірність калібрується Platt scaling на out-of-fold оцінках (5-fold CV).
+
+run_discover понижує relevance_score та не шле в LLM-тріаж очевидні reject;
+run_process для обраних редактором статей лише логує низьку оцінку.
+
+Usage:
+  python scripts/classifier.py --retrain
+  python scripts/classifier.py --score "Hemp fiber plant opens in Poland"
+"""
+
+import argparse
+import math
+import os
+import random
+import re
+import sys
+import zlib
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import (
+    RELEVANCE_MODEL_FILE, REJECTIONS_FILE, REJECTIONS_MAX_ITEMS,
+    CLASSIFIER_MIN_SAMPLES, CLASSIFIER_REJECT_BELOW,
+)
+from utils import load_json, save_json
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKFLOW_FILE = os.path.join(_PROJECT_ROOT, "data", "workflow.json")
+
+HASH_BITS = 18
+MODEL_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}|\d+", re.UNICODE)
+_model_cache = {}
+
+
+# ---------------------------------------------------------------------------
+# Features
+# ---------------------------------------------------------------------------
+
+def candidate_text(item):
+    """Текст кандидата для класифікатора: заголовок + прев'ю мовою джерела (як у candidates.json)."""
+    title = item.get("title", "")
+    preview = item.get("content_preview") or item.get("summary", "")
+    return f"{title} {title} {preview}"  # title counted twice: it is the strongest signal
+
+
+def _features(text):
+    """Хешовані бінарні unigram+bigram ознаки, L2-нормовані. Повертає {index: value}."""
+    tokens = [t for t in _TOKEN_RE.findall(text.lower().replace("&nbsp;", " "))]
+    grams = set(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    mask = (1 << HASH_BITS) - 1
+    indices = {zlib.crc32(g.encode("utf-8")) & mask for g in grams}
+    if not indices:
+        return {}
+    value = 1.0 / math.sqrt(len(indices))
+    return {i: value for i in indices}
+
+
+def _sigmoid(z):
+    if z < -35:
+        return 0.0
+    if z > 35:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def _raw_score(weights, bias, feats):
+    return bias + sum(weights.get(i, 0.0) * v for i, v in feats.items())
+
+
+# ---------------------------------------------------------------------------
+# Training
+# ---------------------------------------------------------------------------
+
+def _train_lr(samples, epochs=20, lr=0.5, l2=1e-4, seed=0):
+    """SGD логістичної регресії з вагами класів. samples: [(feats, label)]."""
+    n_pos = sum(1 for _, y in samples if y) or 1
+    n_neg = len(samples) - n_pos or 1
+    class_weight = {1: len(samples) / (2.0 * n_pos), 0: len(samples) / (2.0 * n_neg)}
+
+    weights = {}
+    bias = 0.0
+    order = list(samples)
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1.0 + epoch * 0.5)
+        for feats, y in order:
+            grad = (_sigmoid(_raw_score(weights, bias, feats)) - y) * class_weight[y]
+            for i, v in feats.items():
+                w = weights.get(i, 0.0)
+                weights[i] = w - step * (grad * v + l2 * w)
+            bias -= step * grad
+    return weights, bias
+
+
+def _fit_platt(scores, labels, iterations=200):
+    """Platt scaling: P = sigmoid(a*score + b) з цілями, згладженими за Platt (1999)."""
+    n_pos = sum(labels)
+    n_neg = len(labels) - n_pos
+    hi = (n_pos + 1.0) / (n_pos + 2.0)
+    lo = 1.0 / (n_neg + 2.0)
+    targets = [hi if y else lo for y in labels]
+
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        # Newton step on the 2-parameter log loss
+        g_a = g_b = h_aa = h_ab = h_bb = 0.0
+        for s, t in zip(scores, targets):
+            p = _sigmoid(a * s + b)
+            d = p - t
+            w = max(p * (1 - p), 1e-12)
+            g_a += d * s
+            g_b += d
+            h_aa += w * s * s
+            h_ab += w * s
+            h_bb += w
+        h_aa += 1e-6
+        h_bb += 1e-6
+        det = h_aa * h_bb - h_ab * h_ab
+        if abs(det) < 1e-12:
+            break
+        da = (h_bb * g_a - h_ab * g_b) / det
+        db = (h_aa * g_b - h_ab * g_a) / det
+        a -= da
+        b -= db
+        if abs(da) < 1e-7 and abs(db) < 1e-7:
+            break
+    return a, b
+
+
+def _load_examples():
+    """
+    (texts, labels) з workflow.json (1) та rejections.json (0), без дублікатів заголовків.
+    Лише поля мовою джерела: записи без оригінального заголовка чи прев'ю пропускаються.
+    """
+    examples = {}
+    for item in load_json(REJECTIONS_FILE, {"items": []}).get("items", []):
+        if item.get("title") and item.get("content_preview"):
+            examples[item["title"].strip().lower()] = (candidate_text(item), 0)
+
+    # Approved/rewritten articles win over an older rejection of the same title.
+    # Their title/summary are the Ukrainian rewrite, so only original_title + content_preview count.
+    for item in load_json(WORKFLOW_FILE, {"articles": []}).get("articles", []):
+        if item.get("status") == "scrape_failed" or item.get("youtube_id"):
+            continue
+        if not item.get("original_title") or not item.get("content_preview"):
+            continue
+        source = {"title": item["original_title"], "content_preview": item["content_preview"]}
+        examples[item["original_title"].strip().lower()] = (candidate_text(source), 1)
+
+    examples.pop("", None)
+    texts = [t for t, _ in examples.values()]
+    labels = [y for _, y in examples.values()]
+    return texts, labels
+
+
+def retrain(folds=5):
+    """Навчає модель на історії та зберігає у RELEVANCE_MODEL_FILE. Повертає dict моделі або None."""
+    texts, labels = _load_examples()
+    n_pos = sum(labels)
+    n_neg = len(labels) - n_pos
+    print(f"[INFO] Training data: {n_pos} relevant, {n_neg} rejected")
+    if min(n_pos, n_neg) < CLASSIFIER_MIN_SAMPLES:
+        print(f"[WARN] Need at least {CLASSIFIER_MIN_SAMPLES} examples per class — model not trained")
+        return None
+
+    samples = [(_features(t), y) for t, y in zip(texts, labels)]
+
+    # Out-of-fold raw scores for calibration and honest metrics
+    indices = list(range(len(samples)))
+    random.Random(1).shuffle(indices)
+    oof = [0.0] * len(samples)
+    for k in range(folds):
+        held = set(indices[k::folds])
+        weights, bias = _train_lr([s for i, s in enumerate(samples) if i not in held])
+        for i in held:
+            oof[i] = _raw_score(weights, bias, samples[i][0])
+
+    platt_a, platt_b = _fit_platt(oof, labels)
+    probs = [_sigmoid(platt_a * s + platt_b) for s in oof]
+    eps = 1e-9
+    metrics = {
+        "cv_accuracy": round(sum((p >= 0.5) == bool(y) for p, y in zip(probs, labels)) / len(labels), 4),
+        "cv_log_loss": round(-sum(
+            math.log(max(eps, p if y else 1 - p)) for p, y in zip(probs, labels)
+        ) / len(labels), 4),
+        "cv_brier": round(sum((p - y) ** 2 for p, y in zip(probs, labels)) / len(labels), 4),
+        # How many true relevant articles the reject threshold would have dropped
+        "cv_false_rejects": sum(1 for p, y in zip(probs, labels) if y and p < CLASSIFIER_REJECT_BELOW),
+        "cv_rejects": sum(1 for p in probs if p < CLASSIFIER_REJECT_BELOW),
+    }
+
+    weights, bias = _train_lr(samples)
+    model = {
+        "version": MODEL_VERSION,
+        "hash_bits": HASH_BITS,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "n_relevant": n_pos,
+        "n_rejected": n_neg,
+        "metrics": metrics,
+        "bias": bias,
+        "platt": [platt_a, platt_b],
+        "weights": {str(i): round(w, 5) for i, w in weights.items() if abs(w) >= 1e-4},
+    }
+    save_json(RELEVANCE_MODEL_FILE, model)
+    _model_cache.clear()
+    print(f"[INFO] Model saved: {len(model['weights'])} weights, CV accuracy {metrics['cv_accuracy']}, "
+          f"log loss {metrics['cv_log_loss']}, Brier {metrics['cv_brier']}, "
+          f"false rejects {metrics['cv_false_rejects']}/{metrics['cv_rejects']}")
+    return model
+
+
+# ---------------------------------------------------------------------------
+# Inference
+# ---------------------------------------------------------------------------
+
+def load_model():
+    """Завантажена модель (кешується за mtime файлу) або None, якщо не навчена."""
+    try:
+        mtime = os.path.getmtime(RELEVANCE_MODEL_FILE)
+    except OSError:
+        return None
+    if _model_cache.get("mtime") != mtime:
+        model = load_json(RELEVANCE_MODEL_FILE, {})
+        if model.get("version") != MODEL_VERSION or model.get("hash_bits") != HASH_BITS:
+            return None
+        model["weights"] = {int(i): w for i, w in model.get("weights", {}).items()}
+        _model_cache.update({"mtime": mtime, "model": model})
+    return _model_cache["model"]
+
+
+def predict(item):
+    """
+    Калібрована P(релевантна) для кандидата (dict з title/content_preview).
+    Повертає {"p_relevant", "reject", "model"} або None, якщо моделі немає.
+    """
+    model = load_model()
+    if not model:
+        return None
+    score = _raw_score(model["weights"], model["bias"], _features(candidate_text(item)))
+    a, b = model["platt"]
+    p = _sigmoid(a * score + b)
+    return {
+        "p_relevant": round(p, 3),
+        "reject": p < CLASSIFIER_REJECT_BELOW,
+        "model": model.get("trained_at", ""),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Rejection log (training negatives)
+# ---------------------------------------------------------------------------
+
+def log_rejection(candidate, reason, stage):
+    """Записує відхилений кандидат у rejections.json. stage: "rewrite" | "triage"."""
+    data = load_json(REJECTIONS_FILE, {"items": []})
+    items = data.setdefault("items", [])
+    key = candidate.get("hash") or candidate.get("link", "")
+    if any((i.get("hash") or i.get("link", "")) == key for i in items):
+        return
+    items.append({
+        "hash": candidate.get("hash", ""),
+        "title": candidate.get("title", ""),
+        "content_preview": (candidate.get("content_preview") or candidate.get("summary", ""))[:300],
+        "link": candidate.get("link", ""),
+        "source": candidate.get("source", ""),
+        "reason": str(reason or "")[:200],
+        "stage": stage,
+        "rejected_at": datetime.now(timezone.utc).isoformat(),
+    })
+    data["items"] = items[-REJECTIONS_MAX_ITEMS:]
+    save_json(REJECTIONS_FILE, data)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local relevance classifier")
+    parser.add_argument("--retrain", action="store_true", help="Train on workflow.json + rejections.json")
+    parser.add_argument("--score", default="", help="Score a title (and optional preview after ' | ')")
+    args = parser.parse_args()
+
+    if args.retrain:
+        sys.exit(0 if retrain() else 1)
+    if args.score:
+        title, _, preview = args.score.partition(" | ")
+        verdict = predict({"title": title, "content_preview": preview})
+        print(verdict if verdict else "[WARN] No trained model — run with --retrain first")
+        sys.exit(0)
+    parser.print_help()
@@ -0,0 +1,117 @@
+"""
+clustering.py — Групування кандидатів, що описують одну подію з різних джерел.
+
+TF-IDF на обрізаних до 6 символів словах (грубий стемінг для української
+морфології) по заголовку та прев'ю, косинусна схожість, single-link кластери
+в межах часового вікна. Кластер отримує стабільний cluster_id (за найстарішим
+кандидатом) і представника (найвищий relevance_score, довіра джерела, обсяг тексту).
+
+Поля на кандидатах у candidates.json (лише для кластерів з 2+ кандидатів):
+  cluster_id, cluster_size, cluster_representative (bool)
+"""
+
+import math
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+from config import CLUSTER_SIMILARITY_THRESHOLD, CLUSTER_WINDOW_DAYS
+
+_WORD_RE = re.compile(r"[^\W\d_]{3,}|\d{2,}", re.UNICODE)
+_STOP_WORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "has", "have", "will",
+    "its", "new", "news", "google", "новини", "про", "для", "від", "або", "що", "які", "який",
+    "яка", "також", "його", "року", "році", "при", "над", "під", "між", "nbsp",
+}
+_STEM_LEN = 6
+_CLUSTER_FIELDS = ("cluster_id", "cluster_size", "cluster_representative")
+
+
+def _terms(candidate):
+    title = candidate.get("title", "")
+    # Google News appends " - Publisher" to titles: not part of the story
+    title = re.sub(r"\s+[-–—]\s+[^-–—]{2,40}$", "", title)
+    text = f"{title} {title} {candidate.get('content_preview') or candidate.get('summary', '')}"
+    # Ukrainian apostrophe is spelled ' ’ ʼ or ` depending on the outlet
+    text = re.sub(r"['’ʼ`]", "", text.lower())
+    return [w[:_STEM_LEN] for w in _WORD_RE.findall(text) if w not in _STOP_WORDS]
+
+
+def _vectors(items):
+    docs = [Counter(_terms(c)) for c in items]
+    df = Counter(term for doc in docs for term in doc)
+    n = len(docs)
+    vectors = []
+    for doc in docs:
+        vec = {t: (1 + math.log(tf)) * math.log((1 + n) / (1 + df[t])) for t, tf in doc.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vectors.append({t: v / norm for t, v in vec.items()})
+    return vectors
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+def _date(candidate):
+    value = candidate.get("date") or candidate.get("added_at") or ""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
+
+
+def _representative_key(candidate):
+    return (
+        candidate.get("relevance_score", 0),
+        bool(candidate.get("source_trusted")),
+        len(candidate.get("content_preview") or ""),
+    )
+
+
+def assign_clusters(items, threshold=None):
+    """Проставляє cluster_* поля на кандидатах (in place). Повертає кількість кластерів 2+."""
+    threshold = CLUSTER_SIMILARITY_THRESHOLD if threshold is None else threshold
+    # YouTube candidates are rewritten from their own transcript: never merged
+    articles = [c for c in items if c.get("type", "article") == "article"]
+    for c in items:
+        for field in _CLUSTER_FIELDS:
+            c.pop(field, None)
+
+    vectors = _vectors(articles)
+    dates = [_date(c) for c in articles]
+    window = timedelta(days=CLUSTER_WINDOW_DAYS)
+
+    parent = list(range(len(articles)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(articles)):
+        for j in range(i + 1, len(articles)):
+            if dates[i] and dates[j] and abs(dates[i] - dates[j]) > window:
+                continue
+            if _cosine(vectors[i], vectors[j]) >= threshold:
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(articles)):
+        groups.setdefault(find(i), []).append(articles[i])
+
+    clusters = 0
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        clusters += 1
+        oldest = min(members, key=lambda c: c.get("added_at") or c.get("date") or "")
+        representative = max(members, key=_representative_key)
+        for c in members:
+            c["cluster_id"] = f"cl-{oldest['id']}"
+            c["cluster_size"] = len(members)
+            c["cluster_representative"] = c is representative
+    return clusters
@@ -220,6 +220,89 @@ _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # File to track already processed articles (prevents duplicates)
 PROCESSED_FILE = os.path.join(_PROJECT_ROOT, "data", "processed.json")
 
+# Persistent cache of parsed rewrite results (key: input text + force_relevant + prompt hash).
+# Not in git: the pipeline keeps it in the Actions cache, saved even when a run fails
+REWRITE_CACHE_FILE = os.path.join(_PROJECT_ROOT, "data", "rewrite_cache.json")
+REWRITE_CACHE_TTL_HOURS = 72
+REWRITE_CACHE_MAX_ENTRIES = 300
+REWRITE_CACHE_MAX_BYTES = 3_000_000
+
+# Local pre-LLM relevance classifier (scripts/classifier.py)
+RELEVANCE_MODEL_FILE = os.path.join(_PROJECT_ROOT, "data", "relevance_model.json")
+# Negative examples for it: candidates rejected by the rewrite model or LLM triage
+REJECTIONS_FILE = os.path.join(_PROJECT_ROOT, "data", "rejections.json")
+REJECTIONS_MAX_ITEMS = 2000
+CLASSIFIER_MIN_SAMPLES = 20      # per class; below this the model is not trained/used
+CLASSIFIER_REJECT_BELOW = 0.1    # calibrated P(relevant) below this = obvious reject
+
+# LLM call telemetry (scripts/telemetry.py): one JSONL entry per rewrite/image call
+LLM_TELEMETRY_FILE = os.path.join(_PROJECT_ROOT, "data", "llm_telemetry.jsonl")
+LLM_TELEMETRY_MAX_BYTES = 2_000_000  # oldest half is dropped when exceeded
+
+# Responsive image derivatives (scripts/image_variants.py): WebP/AVIF per width
+# under static/images/generated/variants/, recorded for Hugo srcset (site.Data.image_variants)
+GENERATED_IMAGES_DIR = os.path.join(_PROJECT_ROOT, "static", "images", "generated")
+IMAGE_VARIANTS_FILE = os.path.join(_PROJECT_ROOT, "data", "image_variants.json")
+IMAGE_VARIANT_WIDTHS = (480, 800, 1280)
+IMAGE_VARIANT_QUALITY = {"avif": 50, "webp": 78}
+
+# Generated/localized JPEGs (scripts/image_encoding.py): lowest quality whose SSIM
+# against the resized original reaches the target, progressive output
+IMAGE_JPEG_SSIM_TARGET = 0.96  # 8×8-window luma SSIM: ~q70–80 for photos, higher for flat art
+IMAGE_JPEG_QUALITY_MIN = 55
+IMAGE_JPEG_QUALITY_MAX = 90
+
+# Low-quality image placeholders (scripts/image_placeholder.py): tiny WebP data URI
+# in front matter (image_lqip), shown as the <img> background until the image loads
+IMAGE_LQIP_WIDTH = 20
+IMAGE_LQIP_QUALITY = 40
+
+# Localized copies of hotlinked images (scripts/image_localizer.py): downloaded once,
+# resized, re-encoded and stored content-addressed under static/images/localized/.
+# Unsplash is not listed: its API guidelines require hotlinking the returned URLs.
+LOCALIZED_IMAGES_DIR = os.path.join(_PROJECT_ROOT, "static", "images", "localized")
+IMAGE_LOCALIZE_SOURCES = ("original",)
+IMAGE_LOCALIZE_MAX_WIDTH = 1280
+IMAGE_LOCALIZE_MAX_BYTES = 15_000_000
+IMAGE_LOCALIZE_CONCURRENCY = 4
+
+# Source image choice (scripts/image_probe.py): feed, og:image and page images are probed
+# by their first bytes (stops as soon as the size is known) and the best landscape one wins
+IMAGE_PROBE_MAX_BYTES = 64 * 1024   # JPEG EXIF thumbnails can push the SOF marker past 16 KB
+IMAGE_PROBE_MIN_WIDTH = 600
+IMAGE_PROBE_MAX_CANDIDATES = 6
+IMAGE_PROBE_CONCURRENCY = 6
+
+# Orphaned image GC (scripts/image_gc.py): two files are the same picture in different
+# encodings when their 64-bit dHash differs in at most this many bits
+IMAGE_GC_DUPLICATE_DISTANCE = 4
+
+# Image reuse index (scripts/image_reuse.py): a new article whose image query is close
+# enough to an earlier one (same category) reuses that Gemini/Unsplash image.
+IMAGE_INDEX_FILE = os.path.join(_PROJECT_ROOT, "data", "image_index.json")
+IMAGE_INDEX_MAX_ITEMS = 500
+IMAGE_REUSE_ENABLED = os.environ.get("IMAGE_REUSE", "1") != "0"
+IMAGE_REUSE_MIN_SIMILARITY = 0.75   # Jaccard over normalized query terms
+IMAGE_REUSE_MAX_USES = 3            # one image on at most this many articles
+IMAGE_REUSE_MAX_AGE_DAYS = 180
+
+# Unsplash search cache (scripts/unsplash_cache.py): results per normalized query,
+# served in rotation; CATEGORY_IMAGE_QUERIES results form the prefetched fallback pool
+UNSPLASH_CACHE_FILE = os.path.join(_PROJECT_ROOT, "data", "unsplash_cache.json")
+UNSPLASH_CACHE_TTL_HOURS = 7 * 24
+UNSPLASH_EMPTY_TTL_HOURS = 24        # "no results" is remembered for a shorter time
+UNSPLASH_RESULTS_PER_QUERY = 10
+UNSPLASH_CACHE_MAX_QUERIES = 300
+UNSPLASH_POOL_REFILL_MAX = 4         # live searches per refill run (free tier: 50/hour)
+
+# Paid-tier list prices, USD per 1M tokens (free-tier calls are reported at this
+# equivalent cost). Models not listed (e.g. OpenRouter ":free") count as 0.
+MODEL_PRICES_USD_PER_1M = {
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached": 0.03},
+    "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40, "cached": 0.025},
+    "gemini-2.5-flash-image": {"input": 0.30, "output": 30.00, "cached": 0.03},
+}
+
 # Feed health tracking
 FEED_HEALTH_FILE = os.path.join(_PROJECT_ROOT, "data", "feed_health.json")
 
@@ -235,8 +318,111 @@ PENDING_MAX_AGE_HOURS = 48
 # Semantic deduplication threshold (0.0 - 1.0)
 SIMILARITY_THRESHOLD = 0.6
 
+# Story clustering at discover (clustering.py): TF-IDF cosine between candidates
+# at or above this joins them into one cluster, if published within the window.
+CLUSTER_SIMILARITY_THRESHOLD = 0.55
+CLUSTER_WINDOW_DAYS = 3
+
 # Delay between API calls (seconds) to stay within free tier
 API_DELAY_SECONDS = 5
 
+# Concurrent rewrite stage (main.run_process): max requests in flight per provider.
+# Actual parallelism adapts down on 429 and is bounded by the RPM/TPM limits below.
+REWRITE_MAX_CONCURRENCY = 4
+
+# Article images (Gemini generation, then Unsplash) are fetched in parallel with the
+# rewrite for articles without a source image; this many image requests at a time.
+IMAGE_PREFETCH_WORKERS = 2
+
+# Discover-time LLM triage (main.py --action discover --triage)
+TRIAGE_BATCH_SIZE = 40          # candidates per triage request (20–50)
+TRIAGE_REJECT_BELOW = 0.3       # relevance below this counts as reject
+
+# Token budgeting for rewrite input (article body only, system prompt excluded).
+# Longer bodies are trimmed to the most informative paragraphs.
+REWRITE_INPUT_TOKEN_BUDGET = {"news": 2000, "video": 1200, "manual": 3500, "cluster": 4000}
+# Upper bound for maxOutputTokens per type (actual value scales with input size)
+REWRITE_MAX_OUTPUT_TOKENS = {"news": 6144, "video": 3072, "manual": 8192, "cluster": 8192}
+
+# Rewrite routing by input size / content type (rewriter._route):
+#   short    — video descriptions and short items: lite model, no thinking
+#   standard — typical news: flash with a bounded thinking budget
+#   long     — manual additions, clusters and long features: flash, larger thinking budget
+# max_output_tokens caps the answer; the thinking budget is added on top. Budgets stay
+# finite: dynamic thinking (-1) counts inside maxOutputTokens and can truncate the answer.
+REWRITE_ROUTES = {
+    "short": {"model": "gemini-2.5-flash-lite", "thinking_budget": 0, "max_output_tokens": 3072},
+    "standard": {"model": "gemini-2.5-flash", "thinking_budget": 1024, "max_output_tokens": 6144},
+    "long": {"model": "gemini-2.5-flash", "thinking_budget": 4096, "max_output_tokens": 8192},
+}
+REWRITE_ROUTE_SHORT_TOKENS = 250     # prompt below this → short (body under ~800 chars: summary-only items)
+REWRITE_ROUTE_LONG_TOKENS = 1800     # prompt above this → long
+REWRITE_ROUTE_SLOW_SECONDS = 45      # standard → short when flash median latency in this run exceeds it
+
+# Per-run circuit breaker for rewrite models: skip a model for a cooldown
+# after N consecutive failures (429, timeout, unparsable response)
+CIRCUIT_FAILURE_THRESHOLD = 2
+CIRCUIT_COOLDOWN_SECONDS = 600
+
+# Hedged rewrite requests (REWRITE_HEDGE=1): if the current provider is slower
+# than its observed latency percentile, start the next one and take the first valid JSON
+REWRITE_HEDGE_ENABLED = os.environ.get("REWRITE_HEDGE", "") == "1"
+REWRITE_HEDGE_PERCENTILE = 0.9
+REWRITE_HEDGE_DEFAULT_DELAY = 40  # seconds, until enough latency samples exist
+
+# Gemini explicit context caching of GEMINI_SYSTEM_PROMPT: created for multi-article
+# runs (rewrite_many with >= MIN_JOBS articles), TTL extended while in use.
+# GEMINI_CONTEXT_CACHE=0 disables
+GEMINI_CONTEXT_CACHE_ENABLED = os.environ.get("GEMINI_CONTEXT_CACHE", "1") != "0"
+GEMINI_CONTEXT_CACHE_MIN_JOBS = 3
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = 900
+GEMINI_CONTEXT_CACHE_REFRESH_MARGIN = 120  # extend TTL when less than this is left
+
+# Streamed rewrite responses (SSE): a {"rejected": true} verdict in the first
+# tokens aborts the request instead of waiting for the full body. Off until it has run in
+# the workflow: REWRITE_STREAM=1 enables
+REWRITE_STREAM_ENABLED = os.environ.get("REWRITE_STREAM", "0") == "1"
+
+# Provider rate limits (free tier) used by the rewrite scheduler — per API key
+GEMINI_RPM_LIMIT = 10
+GEMINI_TPM_LIMIT = 250000
+GEMINI_RPD_LIMIT = 250
+OPENROUTER_RPM_LIMIT = 20
+# Other Gemini text models used by rewrite routing (flash uses the limits above), per API key
+GEMINI_MODEL_LIMITS = {
+    "gemini-2.5-flash-lite": {"rpm": 15, "tpm": 250000, "rpd": 1000},
+}
+# Gemini image generation (gemini-2.5-flash-image), per API key
+GEMINI_IMAGE_RPM_LIMIT = 2
+GEMINI_IMAGE_RPD_LIMIT = 500
+
+# Persistent quota ledger (scripts/quota.py): token buckets per API and per key, kept
+# across runs. "day" buckets reset at midnight Pacific (Google quotas); others refill
+# continuously over period seconds. Gemini text models ("gemini:<model>") take their
+# limits from GEMINI_RPM_LIMIT/GEMINI_RPD_LIMIT and GEMINI_MODEL_LIMITS.
+QUOTA_LEDGER_FILE = os.path.join(_PROJECT_ROOT, "data", "quota_ledger.json")
+QUOTA_LIMITS = {
+    "gemini_image": [{"capacity": GEMINI_IMAGE_RPM_LIMIT, "period": 60},
+                     {"capacity": GEMINI_IMAGE_RPD_LIMIT, "period": "day"}],
+    "unsplash": [{"capacity": 50, "period": 3600}],
+    "youtube": [{"capacity": 10000, "period": "day"}],   # units: search 100, videos 1
+    "telegram": [{"capacity": 20, "period": 60}],        # per chat (groups/channels)
+}
+YOUTUBE_UNIT_COSTS = {"search": 100, "videos": 1}
+TELEGRAM_QUOTA_MAX_WAIT = 90   # seconds a message may wait for its chat's bucket
+
+
+def gemini_api_keys():
+    """Gemini API keys: GEMINI_API_KEYS (comma-separated pool) plus GEMINI_API_KEY, without duplicates.
+
+    Read at call time, so a pool configured after import is picked up.
+    """
+    keys = []
+    for key in [os.environ.get("GEMINI_API_KEY", "")] + os.environ.get("GEMINI_API_KEYS", "").split(","):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
 # Delay between Telegram messages (seconds)
 TELEGRAM_DELAY_SECONDS = 3
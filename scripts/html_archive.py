@@ -0,0 +1,158 @@
+"""
+html_archive.py — Архів сирого HTML для повторної екстракції без повторного fetch.
+
+Кожна завантажена сторінка зберігається content-addressed (sha256 сирих байтів),
+стиснута zstd (якщо встановлено zstandard) або gzip. Індекс — append-only JSONL
+з записами {url, canonical_url, fetched_at, sha256, charset, codec, size}.
+
+Архів вимкнений за замовчуванням. Вмикається змінною оточення HTML_ARCHIVE=1
+(каталог можна змінити через HTML_ARCHIVE_DIR).
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+try:
+    import zstandard as _zstd
+except ImportError:  # zstd is optional, gzip is always available
+    _zstd = None
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ARCHIVE_DIR = os.path.join(_PROJECT_ROOT, "data", "html_archive")
+
+# Tracking query params that do not change page content: utm_* by prefix, the rest exactly
+_TRACKING_PREFIXES = ("utm_",)
+_TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "oc"}
+
+_index_lock = threading.Lock()
+
+
+def is_enabled():
+    """Архів вмикається через HTML_ARCHIVE=1 або явний HTML_ARCHIVE_DIR."""
+    flag = os.environ.get("HTML_ARCHIVE", "").strip().lower()
+    return flag in ("1", "true", "yes") or bool(os.environ.get("HTML_ARCHIVE_DIR"))
+
+
+def archive_dir():
+    return os.environ.get("HTML_ARCHIVE_DIR") or DEFAULT_ARCHIVE_DIR
+
+
+def canonical_url(url):
+    """Нормалізує URL: lowercase host (порт зберігається), без fragment, без tracking-параметрів."""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return url
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not (k.lower().startswith(_TRACKING_PREFIXES) or k.lower() in _TRACKING_PARAMS)
+    ]
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((
+        parsed.scheme.lower(), parsed.netloc.lower(), path,
+        "", urlencode(sorted(query)), "",
+    ))
+
+
+def _object_path(sha, codec):
+    ext = "zst" if codec == "zstd" else "gz"
+    return os.path.join(archive_dir(), "objects", sha[:2], f"{sha}.html.{ext}")
+
+
+def _index_path():
+    return os.path.join(archive_dir(), "index.jsonl")
+
+
+def _compress(raw):
+    if _zstd is not None:
+        return _zstd.ZstdCompressor(level=10).compress(raw), "zstd"
+    return gzip.compress(raw, compresslevel=9), "gzip"
+
+
+def _decompress(blob, codec):
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("zstandard is required to read zstd archive objects")
+        return _zstd.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+def store(url, raw, charset="utf-8", final_url=""):
+    """Зберігає сирі байти сторінки. Повертає sha256 або None при помилці."""
+    if not raw:
+        return None
+    try:
+        sha = hashlib.sha256(raw).hexdigest()
+        codec = "zstd" if _zstd is not None else "gzip"
+        path = _object_path(sha, codec)
+        if not os.path.exists(path):
+            blob, codec = _compress(raw)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+
+        record = {
+            "url": url,
+            "canonical_url": canonical_url(final_url or url),
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "sha256": sha,
+            "charset": charset,
+            "codec": codec,
+            "size": len(raw),
+        }
+        with _index_lock:
+            os.makedirs(archive_dir(), exist_ok=True)
+            with open(_index_path(), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return sha
+    except OSError as e:
+        print(f"   [WARN] HTML archive write failed: {e}")
+        return None
+
+
+def load(record):
+    """Повертає декодований HTML для запису індексу."""
+    with open(_object_path(record["sha256"], record.get("codec", "gzip")), "rb") as f:
+        raw = _decompress(f.read(), record.get("codec", "gzip"))
+    return raw.decode(record.get("charset") or "utf-8", errors="replace")
+
+
+def iter_records(url=None, all_versions=False):
+    """Ітерує записи індексу. За замовчуванням — лише остання версія кожного URL."""
+    path = _index_path()
+    if not os.path.exists(path):
+        return []
+    wanted = canonical_url(url) if url else None
+
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if wanted and rec.get("canonical_url") != wanted:
+                continue
+            records.append(rec)
+
+    if all_versions:
+        return records
+
+    latest = {}
+    for rec in records:
+        key = rec.get("canonical_url", "")
+        if key not in latest or rec.get("fetched_at", "") > latest[key].get("fetched_at", ""):
+            latest[key] = rec
+    return sorted(latest.values(), key=lambda r: r.get("fetched_at", ""))
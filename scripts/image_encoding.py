@@ -0,0 +1,87 @@
+"""
+image_encoding.py — JPEG з підбором якості під цільову SSIM.
+
+Замість фіксованої quality кодер шукає (бінарний пошук у
+IMAGE_JPEG_QUALITY_MIN..IMAGE_JPEG_QUALITY_MAX) найнижчу якість, за якої SSIM
+декодованого JPEG відносно вихідного зображення ≥ IMAGE_JPEG_SSIM_TARGET.
+Прості ілюстрації отримують низьку якість, деталізовані — вищу. Вихід —
+progressive JPEG, усе в пам'яті (без повторного читання файлу).
+
+SSIM рахується по яскравості у вікнах 8×8 без перекриття; середні, дисперсії
+й коваріація — через BOX-resize Pillow, тож без numpy і швидко.
+"""
+
+import io
+from array import array
+
+from config import IMAGE_JPEG_SSIM_TARGET, IMAGE_JPEG_QUALITY_MIN, IMAGE_JPEG_QUALITY_MAX
+
+from PIL import Image, ImageMath
+
+_WINDOW = 8
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _moments(a, b):
+    """Поблочні E[a], E[b], E[a²], E[b²], E[ab] (списки значень по вікнах)."""
+    size = (a.width // _WINDOW, a.height // _WINDOW)
+    box = (0, 0, size[0] * _WINDOW, size[1] * _WINDOW)
+
+    def mean(img):
+        return array("f", img.resize(size, Image.BOX, box=box).tobytes())
+
+    aa = ImageMath.lambda_eval(lambda args: args["a"] * args["a"], a=a)
+    bb = ImageMath.lambda_eval(lambda args: args["b"] * args["b"], b=b)
+    ab = ImageMath.lambda_eval(lambda args: args["a"] * args["b"], a=a, b=b)
+    return mean(a), mean(b), mean(aa), mean(bb), mean(ab)
+
+
+def ssim(reference, candidate):
+    """Середня SSIM яскравості двох зображень однакового розміру (1.0 — ідентичні)."""
+    a = reference.convert("L").convert("F")
+    b = candidate.convert("L").convert("F")
+    if a.width < _WINDOW or a.height < _WINDOW:
+        return 1.0
+    total, count = 0.0, 0
+    for mu_a, mu_b, e_aa, e_bb, e_ab in zip(*_moments(a, b)):
+        var_a = e_aa - mu_a * mu_a
+        var_b = e_bb - mu_b * mu_b
+        cov = e_ab - mu_a * mu_b
+        total += ((2 * mu_a * mu_b + _C1) * (2 * cov + _C2)) / (
+            (mu_a * mu_a + mu_b * mu_b + _C1) * (var_a + var_b + _C2))
+        count += 1
+    return total / count
+
+
+def _encode(img, quality):
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def encode_jpeg(img, target=None):
+    """
+    Progressive JPEG з найнижчою якістю, що дає SSIM ≥ target (за замовчуванням
+    IMAGE_JPEG_SSIM_TARGET). Повертає (bytes, quality, ssim). Якщо ціль недосяжна,
+    кодує з IMAGE_JPEG_QUALITY_MAX.
+    """
+    target = IMAGE_JPEG_SSIM_TARGET if target is None else target
+    img = img.convert("RGB")
+    low, high = IMAGE_JPEG_QUALITY_MIN, IMAGE_JPEG_QUALITY_MAX
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(img, quality)
+        with Image.open(io.BytesIO(data)) as decoded:
+            score = ssim(img, decoded)
+        if score >= target:
+            best = (data, quality, score)
+            high = quality - 1
+        else:
+            low = quality + 1
+    if best is None:
+        data = _encode(img, IMAGE_JPEG_QUALITY_MAX)
+        with Image.open(io.BytesIO(data)) as decoded:
+            best = (data, IMAGE_JPEG_QUALITY_MAX, ssim(img, decoded))
+    return best
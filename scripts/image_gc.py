@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+image_gc.py — Прибирання осиротілих зображень і дублікатів у static/images.
+
+Посилання збираються з content/**/*.md, data/*.json (крім похідних індексів
+image_variants.json / image_index.json), layouts/**/*.html і hugo.toml —
+будь-який рядок виду images/generated/<file> або images/localized/<file>.
+
+Видаляються:
+  - файли static/images/generated і static/images/localized без посилань
+    (відхилені/видалені чернетки);
+  - дублікати (лише з --rewrite-duplicates): байт-в-байт однакові файли, а з
+    Pillow — та сама картинка в різних форматах (PNG і JPG) з однаковими
+    розмірами, за dHash з відстанню ≤ IMAGE_GC_DUPLICATE_DISTANCE. Лишається
+    WebP/JPG перед PNG (далі — та, на яку є посилання, і менша); посилання на
+    решту переписуються на неї. Без прапорця дублікати лише показуються;
+  - похідні variants/<name>.<ext>-<w>.* видалених оригіналів (і похідні, яких
+    немає ні в data/image_variants.json, ні серед імен оригіналів), а також їхні записи
+    в data/image_variants.json і data/image_index.json.
+
+Usage:
+  python scripts/image_gc.py --dry-run               # лише звіт
+  python scripts/image_gc.py                         # видалити осиротілі
+  python scripts/image_gc.py --rewrite-duplicates    # і злити дублікати
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import (
+    GENERATED_IMAGES_DIR, LOCALIZED_IMAGES_DIR, IMAGE_VARIANTS_FILE, IMAGE_INDEX_FILE,
+    IMAGE_GC_DUPLICATE_DISTANCE,
+)
+from utils import load_json, save_json
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow only byte-identical duplicates are found
+    Image = None
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMAGE_DIRS = {"generated": GENERATED_IMAGES_DIR, "localized": LOCALIZED_IMAGES_DIR}
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".avif", ".gif")
+_REF_RE = re.compile(r"images/((?:generated|localized)/[\w.-]+?\.(?:jpe?g|png|webp|avif|gif))\b", re.IGNORECASE)
+# Derived indexes: they follow the files, not the other way round
+_DERIVED_DATA = {os.path.basename(IMAGE_VARIANTS_FILE), os.path.basename(IMAGE_INDEX_FILE)}
+# Which encoding survives a duplicate group: lower is better
+_EXT_RANK = {".webp": 0, ".jpg": 1, ".jpeg": 1, ".avif": 2, ".png": 3, ".gif": 4}
+# Formats, for the rule that perceptual duplicates must differ in format
+_FORMATS = {".jpeg": ".jpg"}
+
+
+def _reference_files():
+    root = _PROJECT_ROOT
+    yield from glob.glob(os.path.join(root, "content", "**", "*.md"), recursive=True)
+    yield from (p for p in glob.glob(os.path.join(root, "data", "*.json"))
+                if os.path.basename(p) not in _DERIVED_DATA)
+    yield from glob.glob(os.path.join(root, "layouts", "**", "*.html"), recursive=True)
+    yield os.path.join(root, "hugo.toml")
+
+
+def collect_references():
+    """{"generated/x.jpg": [файли з посиланням]} по всьому сайту."""
+    refs = {}
+    for path in _reference_files():
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+        for name in set(_REF_RE.findall(text)):
+            refs.setdefault(name, []).append(path)
+    return refs
+
+
+def _image_files():
+    """Відносні імена ("generated/x.jpg") оригіналів у каталогах зображень (без variants/)."""
+    names = []
+    for prefix, directory in _IMAGE_DIRS.items():
+        if os.path.isdir(directory):
+            names += [f"{prefix}/{n}" for n in sorted(os.listdir(directory)) if n.lower().endswith(_IMAGE_EXTS)]
+    return names
+
+
+def _abs(name):
+    prefix, filename = name.split("/", 1)
+    return os.path.join(_IMAGE_DIRS[prefix], filename)
+
+
+def _format(name):
+    ext = os.path.splitext(name)[1].lower()
+    return _FORMATS.get(ext, ext)
+
+
+def _dhash(path):
+    """64-бітний difference hash і (width, height), або None (Pillow недоступний, файл не читається)."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            size = img.size
+            pixels = img.convert("L").resize((9, 8)).tobytes()
+    except (OSError, ValueError):
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits, size
+
+
+def find_duplicates(names):
+    """
+    Групи (списки імен) однакових зображень: за sha256, а з Pillow — за dHash
+    серед файлів різних форматів з однаковими розмірами (схожі різні фото
+    одного формату дублікатами не вважаються).
+    """
+    by_digest = {}
+    for name in names:
+        with open(_abs(name), "rb") as f:
+            by_digest.setdefault(hashlib.sha256(f.read()).hexdigest(), []).append(name)
+    groups = [g for g in by_digest.values() if len(g) > 1]
+    singles = [g[0] for g in by_digest.values() if len(g) == 1]
+
+    hashes = [(name, _dhash(_abs(name))) for name in singles]
+    hashes = [(name, h) for name, h in hashes if h]
+    seen = set()
+    for i, (name, (bits, size)) in enumerate(hashes):
+        if name in seen:
+            continue
+        group = [name]
+        for other, (other_bits, other_size) in hashes[i + 1:]:
+            if other in seen or other_size != size:
+                continue
+            if any(_format(other) == _format(n) for n in group):
+                continue
+            if bin(bits ^ other_bits).count("1") <= IMAGE_GC_DUPLICATE_DISTANCE:
+                group.append(other)
+        if len(group) > 1:
+            seen.update(group)
+            groups.append(group)
+    return groups
+
+
+def _keeper(group, refs):
+    def rank(name):
+        ext = os.path.splitext(name)[1].lower()
+        return (_EXT_RANK.get(ext, 9), name not in refs, os.path.getsize(_abs(name)))
+    return min(group, key=rank)
+
+
+def _rewrite_references(old, new, paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        text = re.sub(rf"images/{re.escape(old)}\b", f"images/{new}", text)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _variant_source(variant):
+    """Ім'я оригіналу для файлу похідної: "ab12cd34.jpg-480.webp" → "ab12cd34.jpg"."""
+    return variant.rsplit("-", 1)[0]
+
+
+def _variant_files(filename):
+    """Похідні одного оригіналу — за повним ім'ям з розширенням, не за stem."""
+    variants_dir = os.path.join(GENERATED_IMAGES_DIR, "variants")
+    if not os.path.isdir(variants_dir):
+        return []
+    return [os.path.join(variants_dir, v) for v in sorted(os.listdir(variants_dir)) if _variant_source(v) == filename]
+
+
+def _indexed_variants(skip):
+    """Імена файлів похідних, на які посилається data/image_variants.json (крім оригіналів skip)."""
+    skip_urls = {f"/images/{name}" for name in skip}
+    return {v["url"].rsplit("/", 1)[1]
+            for key, entry in load_json(IMAGE_VARIANTS_FILE, {}).items() if key not in skip_urls
+            for fmt in ("avif", "webp") for v in entry.get(fmt, [])}
+
+
+def _prune_indexes(removed):
+    """Прибирає записи видалених файлів з похідних індексів."""
+    urls = {f"/images/{name}" for name in removed}
+    variants = load_json(IMAGE_VARIANTS_FILE, {})
+    if any(u in variants for u in urls):
+        save_json(IMAGE_VARIANTS_FILE, {k: v for k, v in variants.items() if k not in urls})
+    index = load_json(IMAGE_INDEX_FILE, {"items": []})
+    items = [i for i in index.get("items", []) if i.get("image", {}).get("url") not in urls]
+    if len(items) != len(index.get("items", [])):
+        index["items"] = items
+        save_json(IMAGE_INDEX_FILE, index)
+
+
+def collect_garbage(dry_run=False, rewrite_duplicates=False):
+    """
+    Видаляє (або з dry_run лише перелічує) осиротілі файли, а з rewrite_duplicates —
+    і дублікати, переписуючи посилання на них. Повертає звільнені байти.
+    """
+    refs = collect_references()
+    names = _image_files()
+
+    remove = {}  # name → reason
+    for group in find_duplicates(names):
+        keeper = _keeper(group, refs)
+        for name in group:
+            if name == keeper:
+                continue
+            if not rewrite_duplicates:
+                print(f"   duplicate: {name} ({len(refs.get(name, []))} reference(s)) ≈ {keeper}")
+                continue
+            remove[name] = f"duplicate of {keeper}"
+            if name in refs:
+                print(f"   {name}: {len(refs[name])} reference(s) → {keeper}")
+                if not dry_run:
+                    _rewrite_references(name, keeper, refs[name])
+                refs.setdefault(keeper, []).extend(refs.pop(name))
+    for name in names:
+        if name not in refs and name not in remove:
+            remove[name] = "unreferenced"
+
+    freed = 0
+    for name, reason in sorted(remove.items()):
+        files = [_abs(name)]
+        if name.startswith("generated/"):
+            files += _variant_files(name.split("/", 1)[1])
+        size = sum(os.path.getsize(p) for p in files)
+        freed += size
+        print(f"   {'would remove' if dry_run else 'removed'} {name} ({size // 1024} KB, {reason})")
+        if not dry_run:
+            for path in files:
+                os.remove(path)
+
+    # Variants whose original no longer exists at all (incl. stem-named ones no index entry uses)
+    variants_dir = os.path.join(GENERATED_IMAGES_DIR, "variants")
+    if os.path.isdir(variants_dir):
+        sources = {n.split("/", 1)[1] for n in names if n.startswith("generated/")}
+        indexed = _indexed_variants(remove)
+        for filename in sorted(os.listdir(variants_dir)):
+            if _variant_source(filename) not in sources and filename not in indexed:
+                path = os.path.join(variants_dir, filename)
+                freed += os.path.getsize(path)
+                print(f"   {'would remove' if dry_run else 'removed'} generated/variants/{filename} (orphaned variant)")
+                if not dry_run:
+                    os.remove(path)
+
+    if not dry_run and remove:
+        _prune_indexes(remove)
+    kept = len(names) - len(remove)
+    print(f"[INFO] Image GC: {len(remove)} of {len(names)} files {'removable' if dry_run else 'removed'}, "
+          f"{freed / 1_000_000:.1f} MB{' would be' if dry_run else ''} freed, {kept} kept"
+          + ("" if Image else " (no Pillow: only byte-identical duplicates checked)"))
+    return freed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove unreferenced and duplicate images from static/images")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--rewrite-duplicates", action="store_true",
+                        help="Point references to duplicates at one kept copy and remove the rest")
+    args = parser.parse_args()
+    collect_garbage(dry_run=args.dry_run, rewrite_duplicates=args.rewrite_duplicates)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+image_localizer.py — Локальні копії зображень, що раніше хотлінкались.
+
+Зображення джерела (RSS, og:image, картинка зі сторінки) завантажується один раз,
+зменшується до IMAGE_LOCALIZE_MAX_WIDTH, перекодовується в JPEG (якість під
+цільову SSIM, image_encoding) і зберігається
+content-addressed: static/images/localized/<sha256[:16]>.jpg (однакові зображення
+різних статей — один файл). Поле image у front matter вказує на локальну копію,
+оригінальний URL лишається в image_original_url.
+
+Одночасних завантажень не більше IMAGE_LOCALIZE_CONCURRENCY (семафор на процес).
+Помилка завантаження не критична: лишається віддалений URL.
+
+Usage:
+  python scripts/image_localizer.py --backfill            # content/news: зображення сторонніх сайтів
+  python scripts/image_localizer.py --backfill --dry-run
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import (
+    LOCALIZED_IMAGES_DIR, IMAGE_LOCALIZE_SOURCES, IMAGE_LOCALIZE_MAX_WIDTH,
+    IMAGE_LOCALIZE_MAX_BYTES, IMAGE_LOCALIZE_CONCURRENCY,
+)
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow files are stored as downloaded
+    Image = None
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_URL_PREFIX = "/images/localized"
+_UA = "Mozilla/5.0 (compatible; KONOPLA.UA/1.0)"
+_RAW_EXTS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
+
+_download_slots = threading.BoundedSemaphore(IMAGE_LOCALIZE_CONCURRENCY)
+
+
+def _download(url):
+    """Байти зображення та content-type. Піднімає ValueError для не-зображень і завеликих файлів."""
+    req = urllib.request.Request(url, headers={"User-Agent": _UA, "Accept": "image/*"})
+    with _download_slots, urllib.request.urlopen(req, timeout=20) as resp:
+        content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and not content_type.startswith("image/"):
+            raise ValueError(f"not an image ({content_type})")
+        data = resp.read(IMAGE_LOCALIZE_MAX_BYTES + 1)
+    if len(data) > IMAGE_LOCALIZE_MAX_BYTES:
+        raise ValueError(f"larger than {IMAGE_LOCALIZE_MAX_BYTES // 1_000_000} MB")
+    return data, content_type
+
+
+def _encode(data, content_type):
+    """(bytes, ext): JPEG не ширше IMAGE_LOCALIZE_MAX_WIDTH, або оригінал без Pillow."""
+    if Image is None:
+        ext = _RAW_EXTS.get(content_type)
+        if not ext:
+            raise ValueError(f"unsupported type {content_type or 'unknown'} without Pillow")
+        return data, ext
+
+    from image_encoding import encode_jpeg
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    else:
+        img = img.convert("RGB")
+    if img.width > IMAGE_LOCALIZE_MAX_WIDTH:
+        height = round(img.height * IMAGE_LOCALIZE_MAX_WIDTH / img.width)
+        img = img.resize((IMAGE_LOCALIZE_MAX_WIDTH, height), getattr(Image, "LANCZOS", Image.BICUBIC))
+    return encode_jpeg(img)[0], "jpg"
+
+
+def localize_url(url):
+    """Локальна копія віддаленого зображення. Повертає (site_url, local_path) або (None, None)."""
+    try:
+        data, content_type = _download(url)
+        encoded, ext = _encode(data, content_type)
+    except Exception as e:  # network, HTTP, decoder or decompression-bomb errors
+        print(f"   [WARN] Image localization failed for {url[:80]}: {e}")
+        return None, None
+
+    filename = f"{hashlib.sha256(encoded).hexdigest()[:16]}.{ext}"
+    filepath = os.path.join(LOCALIZED_IMAGES_DIR, filename)
+    if not os.path.exists(filepath):
+        os.makedirs(LOCALIZED_IMAGES_DIR, exist_ok=True)
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, filepath)
+    print(f"   📥 Localized image: {len(data) // 1024} KB → {len(encoded) // 1024} KB ({filename})")
+    return f"{_URL_PREFIX}/{filename}", os.path.relpath(filepath, _PROJECT_ROOT)
+
+
+def localize_image(image_data):
+    """
+    image_data з локальною копією (url → /images/localized/..., local_path, original_url).
+    Джерела поза IMAGE_LOCALIZE_SOURCES, локальні шляхи та невдалі завантаження
+    повертаються без змін.
+    """
+    if not image_data or image_data.get("source") not in IMAGE_LOCALIZE_SOURCES:
+        return image_data
+    url = image_data.get("url", "")
+    if not url.startswith(("http://", "https://")):
+        return image_data
+    site_url, local_path = localize_url(url)
+    if not site_url:
+        return image_data
+    return dict(image_data, url=site_url, thumb=site_url, local_path=local_path, original_url=url)
+
+
+# ---------------------------------------------------------------------------
+# Backfill of existing articles
+# ---------------------------------------------------------------------------
+
+_IMAGE_LINE_RE = re.compile(r'^image: "(https?://[^"]+)"$', re.MULTILINE)
+# Unsplash must be hotlinked; YouTube thumbnails come with youtube_id and stay remote
+_HOTLINK_HOSTS = {"images.unsplash.com", "plus.unsplash.com", "i.ytimg.com", "img.youtube.com"}
+
+
+def _backfill_file(path, dry_run):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    front_matter = text.split("\n---", 1)[0]
+    match = _IMAGE_LINE_RE.search(front_matter)
+    # image_source is unreliable on older articles: decide by host instead
+    if not match or urllib.parse.urlsplit(match.group(1)).hostname in _HOTLINK_HOSTS:
+        return False
+    if dry_run:
+        print(f"   would localize {os.path.basename(path)}: {match.group(1)[:80]}")
+        return True
+    site_url, _ = localize_url(match.group(1))
+    if not site_url:
+        return False
+    replacement = f'image: "{site_url}"\nimage_original_url: "{match.group(1)}"'
+    text = text[:match.start()] + replacement + text[match.end():]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def backfill(content_dir, dry_run=False):
+    """Локалізує хотлінковані зображення (крім Unsplash і YouTube) у вже створених статтях. Повертає кількість статей."""
+    paths = [os.path.join(content_dir, n) for n in sorted(os.listdir(content_dir)) if n.endswith(".md")]
+    with ThreadPoolExecutor(max_workers=IMAGE_LOCALIZE_CONCURRENCY) as executor:
+        done = sum(executor.map(lambda p: _backfill_file(p, dry_run), paths))
+    print(f"[INFO] {'Would localize' if dry_run else 'Localized'} images in {done}/{len(paths)} articles")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download hotlinked article images into static/images")
+    parser.add_argument("--backfill", action="store_true", help="Localize images of existing articles")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be localized")
+    parser.add_argument("--content-dir", default=os.path.join(_PROJECT_ROOT, "content", "news"))
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        sys.exit(0)
+    backfill(args.content_dir, dry_run=args.dry_run)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+image_placeholder.py — LQIP (крихітне розмите прев'ю) і розміри зображень статей.
+
+Для зображення статті рахує:
+  lqip   — data:image/webp;base64,... шириною IMAGE_LQIP_WIDTH px (~200–400 байт)
+  width, height — власні розміри зображення
+Publisher пише їх у front matter як image_lqip / image_w / image_h; шаблони
+ставлять width/height на <img> (без зсуву макета) і lqip фоном, доки вантажиться
+саме зображення.
+
+Джерела:
+  локальні файли (Gemini, локалізовані) — Pillow
+  Unsplash — крихітна WebP-версія з їхнього imgix CDN (Pillow не потрібен),
+             розміри — з відповіді API
+  інші віддалені URL — завантаження + Pillow
+Без Pillow або при помилці поля просто не додаються.
+
+Usage:
+  python scripts/image_placeholder.py --backfill            # content/news без image_lqip
+  python scripts/image_placeholder.py --backfill --dry-run
+"""
+
+import argparse
+import base64
+import io
+import os
+import re
+import sys
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import IMAGE_LQIP_WIDTH, IMAGE_LQIP_QUALITY, IMAGE_LOCALIZE_CONCURRENCY
+from image_localizer import _download
+
+try:
+    from PIL import Image
+except ImportError:  # placeholders are optional: pages still render without them
+    Image = None
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STATIC_DIR = os.path.join(_PROJECT_ROOT, "static")
+_UA = "Mozilla/5.0 (compatible; KONOPLA.UA/1.0)"
+_UNSPLASH_HOSTS = {"images.unsplash.com", "plus.unsplash.com"}
+
+
+def lqip_data_uri(img):
+    """data URI крихітної WebP-копії відкритого зображення."""
+    tiny = img.convert("RGB")
+    height = max(1, round(img.height * IMAGE_LQIP_WIDTH / img.width))
+    tiny = tiny.resize((IMAGE_LQIP_WIDTH, height), getattr(Image, "LANCZOS", Image.BICUBIC))
+    out = io.BytesIO()
+    tiny.save(out, "WEBP", quality=IMAGE_LQIP_QUALITY)
+    return "data:image/webp;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def _from_bytes(data):
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        return {"lqip": lqip_data_uri(img), "width": img.width, "height": img.height}
+
+
+def _from_file(path):
+    with Image.open(path) as img:
+        return {"lqip": lqip_data_uri(img), "width": img.width, "height": img.height}
+
+
+def _from_unsplash(url, width=None, height=None):
+    """Прев'ю з imgix-параметрами Unsplash; розміри — за шириною w з URL і пропорцією оригіналу."""
+    parts = urllib.parse.urlsplit(url)
+    params = dict(urllib.parse.parse_qsl(parts.query))
+    display_w = int(params.get("w", 0)) or width
+    params.update(w=str(IMAGE_LQIP_WIDTH), q=str(IMAGE_LQIP_QUALITY), fm="webp")
+    tiny_url = urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(params)))
+
+    req = urllib.request.Request(tiny_url, headers={"User-Agent": _UA})
+    with urllib.request.urlopen(req, timeout=15) as resp:
+        if not resp.headers.get("Content-Type", "").startswith("image/"):
+            raise ValueError(f"not an image ({resp.headers.get('Content-Type')})")
+        data = resp.read(64 * 1024)
+    result = {"lqip": "data:image/webp;base64," + base64.b64encode(data).decode("ascii")}
+    if display_w and width and height:
+        result.update(width=display_w, height=round(height * display_w / width))
+    return result
+
+
+def _local_path(url, local_path=None):
+    if local_path:
+        return os.path.join(_PROJECT_ROOT, local_path)
+    if url.startswith("/images/"):
+        return os.path.join(_STATIC_DIR, url.lstrip("/"))
+    return None
+
+
+def describe(url, local_path=None, width=None, height=None):
+    """
+    {"lqip", "width", "height"} для зображення (URL з front matter або локальний файл),
+    або {} — Pillow недоступний, формат не підтримується, мережа недоступна.
+    width/height — розміри оригіналу Unsplash, якщо відомі.
+    """
+    try:
+        if urllib.parse.urlsplit(url).hostname in _UNSPLASH_HOSTS:
+            return _from_unsplash(url, width, height)
+        if Image is None:
+            return {}
+        path = _local_path(url, local_path)
+        if path:
+            return _from_file(path) if os.path.exists(path) else {}
+        if url.startswith(("http://", "https://")):
+            return _from_bytes(_download(url)[0])
+    except Exception as e:  # network, HTTP or decoder errors
+        print(f"   [WARN] Image placeholder failed for {url[:80]}: {e}")
+    return {}
+
+
+def add_placeholder(image_data):
+    """image_data з полями lqip, width, height (якщо їх вдалося порахувати)."""
+    if not image_data or not image_data.get("url") or image_data.get("lqip"):
+        return image_data
+    info = describe(
+        image_data["url"], image_data.get("local_path"),
+        image_data.get("width"), image_data.get("height"),
+    )
+    return dict(image_data, **info) if info else image_data
+
+
+# ---------------------------------------------------------------------------
+# Backfill of existing articles
+# ---------------------------------------------------------------------------
+
+_IMAGE_LINE_RE = re.compile(r'^image: "([^"]+)"$', re.MULTILINE)
+
+
+def front_matter_lines(info):
+    """Рядки front matter для результату describe()."""
+    lines = []
+    if info.get("lqip"):
+        lines.append(f'image_lqip: "{info["lqip"]}"')
+    if info.get("width") and info.get("height"):
+        lines.append(f'image_w: {info["width"]}')
+        lines.append(f'image_h: {info["height"]}')
+    return lines
+
+
+def _backfill_file(path, dry_run):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    front_matter = text.split("\n---", 1)[0]
+    match = _IMAGE_LINE_RE.search(front_matter)
+    if not match or "\nimage_lqip:" in front_matter or "\nyoutube_id:" in front_matter:
+        return False
+    if dry_run:
+        print(f"   would add placeholder to {os.path.basename(path)}: {match.group(1)[:80]}")
+        return True
+    lines = front_matter_lines(describe(match.group(1)))
+    if not lines:
+        return False
+    text = text[:match.end()] + "\n" + "\n".join(lines) + text[match.end():]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def backfill(content_dir, dry_run=False):
+    """Додає image_lqip/image_w/image_h статтям, де їх ще немає. Повертає кількість статей."""
+    if Image is None and not dry_run:
+        print("[WARN] Pillow not installed — only Unsplash images get placeholders")
+    paths = [os.path.join(content_dir, n) for n in sorted(os.listdir(content_dir)) if n.endswith(".md")]
+    with ThreadPoolExecutor(max_workers=IMAGE_LOCALIZE_CONCURRENCY) as executor:
+        done = sum(executor.map(lambda p: _backfill_file(p, dry_run), paths))
+    print(f"[INFO] {'Would add' if dry_run else 'Added'} placeholders to {done}/{len(paths)} articles")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add LQIP placeholders and image dimensions to articles")
+    parser.add_argument("--backfill", action="store_true", help="Process existing articles")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be changed")
+    parser.add_argument("--content-dir", default=os.path.join(_PROJECT_ROOT, "content", "news"))
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        sys.exit(0)
+    backfill(args.content_dir, dry_run=args.dry_run)
@@ -0,0 +1,160 @@
+"""
+image_probe.py — Розміри й формат зображень-кандидатів за першими байтами.
+
+Зображення статті може прийти з RSS (fetcher.extract_images), og:image або
+сторінки (scraper). Замість «першого ліпшого» всі кандидати пробуються
+паралельно: з кожного URL читаються лише перші кілобайти (Range-запит,
+не більше IMAGE_PROBE_MAX_BYTES), з заголовка файлу беруться тип і розміри
+(JPEG SOF, PNG IHDR, GIF, WebP VP8/VP8L/VP8X, AVIF ispe).
+
+choose_image() обирає найкраще горизонтальне зображення: не вужче
+IMAGE_PROBE_MIN_WIDTH, з пропорціями, близькими до 16:9, не завелике для
+локалізації. Якщо жоден кандидат не вдалося прочитати, лишається порядок
+джерел (фід → og:image → сторінка), як раніше.
+"""
+
+import math
+import struct
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    IMAGE_PROBE_MAX_BYTES, IMAGE_PROBE_MIN_WIDTH, IMAGE_PROBE_MAX_CANDIDATES, IMAGE_PROBE_CONCURRENCY,
+    IMAGE_LOCALIZE_MAX_BYTES,
+)
+
+_UA = "Mozilla/5.0 (compatible; KONOPLA.UA/1.0)"
+_CHUNK = 4096
+_TARGET_RATIO = 16 / 9
+# Known not to work as the article image ("missing" — the URL answered 404/410)
+_UNUSABLE_TYPES = ("svg", "gif", "missing")
+# JPEG start-of-frame markers (C4 = DHT, C8 = JPG, CC = DAC are not frames)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:  # no length field
+            i += 2
+            continue
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+
+def parse_header(data):
+    """(type, width, height) за першими байтами файлу; розміри None, якщо їх ще не видно."""
+    if data.startswith(b"\xff\xd8"):
+        size = _jpeg_size(data)
+        return ("jpeg", *size) if size else ("jpeg", None, None)
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return ("png", *struct.unpack(">II", data[16:24]))
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return ("gif", *struct.unpack("<HH", data[6:10]))
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        size = _webp_size(data)
+        return ("webp", *size) if size else ("webp", None, None)
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        pos = data.find(b"ispe")
+        if pos != -1 and len(data) >= pos + 16:
+            return ("avif", *struct.unpack(">II", data[pos + 8:pos + 16]))
+        return ("avif", None, None)
+    if data.lstrip()[:5].lower() in (b"<?xml", b"<svg "):
+        return "svg", None, None
+    return None, None, None
+
+
+def probe(url):
+    """
+    {"url", "type", "width", "height", "bytes"} за першими кілобайтами зображення,
+    або None (мережа, 403, не зображення). bytes — повний розмір, якщо відомий;
+    type "missing" — URL відповів 404/410.
+    """
+    req = urllib.request.Request(url, headers={
+        "User-Agent": _UA, "Accept": "image/*", "Range": f"bytes=0-{IMAGE_PROBE_MAX_BYTES - 1}",
+    })
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            if resp.status == 206:
+                total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                total = int(total) if total.isdigit() else None
+            else:  # Range ignored: the whole file is coming, only its head is read
+                total = int(resp.headers.get("Content-Length") or 0) or None
+            data = b""
+            kind = width = height = None
+            while len(data) < IMAGE_PROBE_MAX_BYTES:
+                chunk = resp.read(min(_CHUNK, IMAGE_PROBE_MAX_BYTES - len(data)))
+                if not chunk:
+                    break
+                data += chunk
+                kind, width, height = parse_header(data)
+                if width or (kind is None and len(data) >= 32):
+                    break
+    except urllib.error.HTTPError as e:
+        print(f"   [WARN] Image probe failed for {url[:80]}: HTTP {e.code}")
+        if e.code in (404, 410):
+            return {"url": url, "type": "missing", "width": None, "height": None, "bytes": None}
+        return None
+    except Exception as e:  # network or malformed header errors
+        print(f"   [WARN] Image probe failed for {url[:80]}: {e}")
+        return None
+    if kind is None:
+        return None
+    return {"url": url, "type": kind, "width": width, "height": height, "bytes": total}
+
+
+def score(info):
+    """Оцінка кандидата (більше — краще) або None, якщо він не підходить як головне фото."""
+    if info["type"] in _UNUSABLE_TYPES or not info["width"] or not info["height"]:
+        return None
+    if info["bytes"] and info["bytes"] > IMAGE_LOCALIZE_MAX_BYTES:
+        return None
+    ratio = info["width"] / info["height"]
+    if info["width"] < IMAGE_PROBE_MIN_WIDTH or ratio < 1.0:
+        return None
+    # Enough pixels for the 1280 px article width, shaped like the 16:9 card
+    return min(info["width"], 1280) / 1280 - 0.5 * abs(math.log(ratio / _TARGET_RATIO))
+
+
+def choose_image(urls):
+    """
+    Найкраще головне зображення серед urls (у порядку пріоритету джерел).
+    Повертає (url або "", [результати probe для логів]).
+    """
+    urls = list(dict.fromkeys(u for u in urls if u and u.startswith(("http://", "https://"))))
+    urls = urls[:IMAGE_PROBE_MAX_CANDIDATES]
+    if not urls:
+        return "", []
+    with ThreadPoolExecutor(max_workers=min(IMAGE_PROBE_CONCURRENCY, len(urls))) as executor:
+        probes = list(executor.map(probe, urls))
+
+    scored = [(score(p), -i, p) for i, p in enumerate(probes) if p and score(p) is not None]
+    if scored:
+        return max(scored, key=lambda s: s[:2])[2]["url"], [p for p in probes if p]
+    # Nothing usable was measured (hotlink protection, SOF past the probe limit): keep the source order
+    unknown = [url for url, p in zip(urls, probes)
+               if p is None or (not p["width"] and p["type"] not in _UNUSABLE_TYPES)]
+    return (unknown[0] if unknown else ""), [p for p in probes if p]
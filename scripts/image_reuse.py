@@ -0,0 +1,120 @@
+"""
+image_reuse.py — Повторне використання згенерованих і стокових зображень.
+
+Персистентний індекс data/image_index.json: нормалізований запит (image_query або
+заголовок) + категорія → image_data (Gemini-файл у static/images/generated або
+результат Unsplash). Якщо новий запит достатньо близький до збереженого
+(Jaccard по нормалізованих термінах ≥ IMAGE_REUSE_MIN_SIMILARITY, та сама категорія),
+images.get_article_image віддає існуюче зображення замість нової генерації/пошуку.
+
+Політика (config.py): IMAGE_REUSE_ENABLED, IMAGE_REUSE_MIN_SIMILARITY,
+IMAGE_REUSE_MAX_USES (одне фото — не більше N статей), IMAGE_REUSE_MAX_AGE_DAYS.
+"""
+
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+
+from config import (
+    IMAGE_INDEX_FILE, IMAGE_INDEX_MAX_ITEMS, IMAGE_REUSE_ENABLED,
+    IMAGE_REUSE_MIN_SIMILARITY, IMAGE_REUSE_MAX_USES, IMAGE_REUSE_MAX_AGE_DAYS,
+)
+from utils import load_json, save_json
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WORD_RE = re.compile(r"[^\W_]{2,}", re.UNICODE)
+_STOP_WORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "and", "with", "at", "to", "by", "from",
+    "photo", "image", "picture", "closeup", "close", "up", "view",
+    "та", "і", "й", "в", "у", "на", "з", "із", "для", "про", "від", "до",
+}
+_lock = threading.Lock()
+
+
+def query_terms(query):
+    """Нормалізовані терміни запиту: нижній регістр, без стоп-слів, грубий стемінг."""
+    terms = set()
+    for word in _WORD_RE.findall((query or "").lower()):
+        if word in _STOP_WORDS:
+            continue
+        if word.isascii() and len(word) > 3:
+            # fields → field, fibres → fibre: enough for short English stock queries
+            word = re.sub(r"(?:ies|es|s)$", lambda m: "y" if m.group() == "ies" else "", word)
+        else:
+            word = word[:6]  # Ukrainian inflections: shared prefix
+        terms.add(word)
+    return sorted(terms)
+
+
+def _similarity(a, b):
+    a, b = set(a), set(b)
+    if not a or not b:
+        return 0.0  # an empty query says nothing about the picture
+    return len(a & b) / len(a | b)
+
+
+def _asset_exists(image_data):
+    """Gemini-зображення має існувати на диску; зовнішні URL вважаються живими."""
+    local_path = image_data.get("local_path")
+    return not local_path or os.path.exists(os.path.join(_PROJECT_ROOT, local_path))
+
+
+def find_reusable(query, category):
+    """
+    Найближче збережене зображення для (query, category) згідно з політикою reuse,
+    або None. Лічильник використань запису збільшується.
+    """
+    if not IMAGE_REUSE_ENABLED:
+        return None
+    terms = query_terms(query)
+    if not terms:
+        return None
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=IMAGE_REUSE_MAX_AGE_DAYS)).isoformat()
+
+    with _lock:
+        index = load_json(IMAGE_INDEX_FILE, {"items": []})
+        best, best_sim = None, 0.0
+        for item in index.get("items", []):
+            if item.get("category") != category or item.get("uses", 0) >= IMAGE_REUSE_MAX_USES:
+                continue
+            if item.get("created_at", "") < cutoff:
+                continue
+            sim = _similarity(terms, item.get("terms", []))
+            if sim >= IMAGE_REUSE_MIN_SIMILARITY and sim > best_sim and _asset_exists(item["image"]):
+                best, best_sim = item, sim
+        if not best:
+            return None
+        best["uses"] = best.get("uses", 0) + 1
+        best["last_used_at"] = datetime.now(timezone.utc).isoformat()
+        save_json(IMAGE_INDEX_FILE, index)
+
+    print(f"   ♻️ Reusing {best['image'].get('source', '')} image for \"{query[:50]}\" "
+          f"(matched \"{best['query'][:50]}\", similarity {best_sim:.2f}, use {best['uses']})")
+    return dict(best["image"], reused=True)
+
+
+def remember(query, category, image_data):
+    """Записує нове зображення в індекс (найстаріші записи витісняються)."""
+    if not image_data or image_data.get("source") not in ("gemini", "unsplash"):
+        return
+    terms = query_terms(query)
+    if not terms:  # nothing to match a later query against
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    image = {k: v for k, v in image_data.items() if k != "reused"}
+    with _lock:
+        index = load_json(IMAGE_INDEX_FILE, {"items": []})
+        items = index.setdefault("items", [])
+        items.append({
+            "query": query or "",
+            "terms": terms,
+            "category": category,
+            "image": image,
+            "uses": 1,
+            "created_at": now,
+            "last_used_at": now,
+        })
+        index["items"] = items[-IMAGE_INDEX_MAX_ITEMS:]
+        save_json(IMAGE_INDEX_FILE, index)
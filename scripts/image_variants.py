@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+image_variants.py — Адаптивні похідні зображень (WebP/AVIF у кількох ширинах).
+
+Для кожного файлу static/images/generated/<name>.(jpg|png) створює
+static/images/generated/variants/<name>.<ext>-<width>.(avif|webp) (ім'я з
+розширенням оригіналу: foo.jpg і foo.png не перезаписують одне одного) і записує їх у
+data/image_variants.json — Hugo читає його як site.Data.image_variants
+і віддає <picture> з srcset (article-card.html, single.html). Оригінал
+лишається fallback-ом для старих браузерів.
+
+Запис (ключ — URL з front matter):
+  "/images/generated/ab12cd34.jpg": {
+    "width": 1280, "height": 720, "bytes": 183405,
+    "avif": [{"w": 480, "url": "/images/generated/variants/ab12cd34.jpg-480.avif"}, ...],
+    "webp": [...]
+  }
+
+AVIF потребує Pillow з AVIF-кодеком (Pillow >= 11.3 або pillow-avif-plugin);
+без нього створюються лише WebP.
+
+Usage:
+  python scripts/image_variants.py            # інкрементально: лише нові/змінені (за розміром) файли
+  python scripts/image_variants.py --force    # перегенерувати все
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import GENERATED_IMAGES_DIR, IMAGE_VARIANTS_FILE, IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_QUALITY
+from utils import load_json, save_json
+
+try:
+    from PIL import Image
+except ImportError:  # derivatives are optional: originals are still served
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401 — registers the AVIF codec on older Pillow
+except ImportError:
+    pass
+
+_SOURCE_EXTS = (".jpg", ".jpeg", ".png")
+_URL_PREFIX = "/images/generated"
+_index_lock = threading.Lock()  # images are generated from several worker threads
+
+
+def _formats():
+    """Доступні формати похідних, від найкомпактнішого."""
+    Image.init()
+    return [fmt for fmt in ("avif", "webp") if fmt.upper() in Image.SAVE]
+
+
+def _widths(source_width):
+    """Ширини похідних: лише менші за оригінал, плюс сам оригінал (без апскейлу)."""
+    widths = [w for w in IMAGE_VARIANT_WIDTHS if w < source_width]
+    return widths + [min(source_width, max(IMAGE_VARIANT_WIDTHS))]
+
+
+def _variant_name(filename, width, fmt):
+    """Ім'я похідної файлу filename (повне ім'я оригіналу з розширенням)."""
+    return f"{filename}-{width}.{fmt}"
+
+
+def _named_for(entry, filename):
+    """Чи названі похідні запису за повним ім'ям оригіналу (старі записи — лише за stem)."""
+    prefix = f"{_URL_PREFIX}/variants/{filename}-"
+    return all(v["url"].startswith(prefix) for fmt in ("avif", "webp") for v in entry.get(fmt, []))
+
+
+def build_variants(filepath, index=None, force=False):
+    """
+    Створює похідні одного файлу з GENERATED_IMAGES_DIR і оновлює index.
+    index=None — завантажує та зберігає data/image_variants.json сам (під локом).
+    Повертає запис або None (Pillow недоступний, файл не зображення).
+    """
+    if Image is None:
+        print("   [INFO] Pillow not available, skipping image variants")
+        return None
+
+    if index is None:
+        with _index_lock:
+            index = load_json(IMAGE_VARIANTS_FILE, {})
+            entry = build_variants(filepath, index, force=force)
+            if entry:
+                save_json(IMAGE_VARIANTS_FILE, index)
+            return entry
+
+    filename = os.path.basename(filepath)
+    key = f"{_URL_PREFIX}/{filename}"
+    # Size, not mtime: a fresh CI checkout resets mtimes of every file
+    size = os.path.getsize(filepath)
+    entry = index.get(key)
+    if entry and entry.get("bytes") == size and not force and _named_for(entry, filename):
+        return entry
+
+    out_dir = os.path.join(GENERATED_IMAGES_DIR, "variants")
+    os.makedirs(out_dir, exist_ok=True)
+
+    try:
+        with Image.open(filepath) as img:
+            img = img.convert("RGB")
+            entry = {"width": img.width, "height": img.height, "bytes": size}
+            resample = getattr(Image, "LANCZOS", Image.BICUBIC)
+            for fmt in _formats():
+                entry[fmt] = []
+                for width in _widths(img.width):
+                    height = round(img.height * width / img.width)
+                    resized = img if width == img.width else img.resize((width, height), resample)
+                    out_name = _variant_name(filename, width, fmt)
+                    save_kwargs = {"quality": IMAGE_VARIANT_QUALITY[fmt]}
+                    if fmt == "webp":
+                        save_kwargs["method"] = 6
+                    resized.save(os.path.join(out_dir, out_name), fmt.upper(), **save_kwargs)
+                    entry[fmt].append({"w": width, "url": f"{_URL_PREFIX}/variants/{out_name}"})
+    except (OSError, ValueError) as e:
+        print(f"   [WARN] Image variants failed for {filename}: {e}")
+        return None
+
+    index[key] = entry
+    return entry
+
+
+def build_all(force=False):
+    """Інкрементальний прохід по GENERATED_IMAGES_DIR. Повертає кількість оброблених файлів."""
+    if Image is None:
+        print("[WARN] Pillow not installed — no image variants built")
+        return 0
+
+    index = load_json(IMAGE_VARIANTS_FILE, {})
+    names = sorted(n for n in os.listdir(GENERATED_IMAGES_DIR) if n.lower().endswith(_SOURCE_EXTS))
+    built = 0
+    for name in names:
+        key = f"{_URL_PREFIX}/{name}"
+        before = index.get(key)
+        entry = build_variants(os.path.join(GENERATED_IMAGES_DIR, name), index, force=force)
+        if entry and entry is not before:
+            built += 1
+
+    # Drop records of deleted originals
+    for key in [k for k in index if os.path.basename(k) not in names]:
+        del index[key]
+
+    save_json(IMAGE_VARIANTS_FILE, index)
+    print(f"[INFO] Image variants: {built} built, {len(index)} images indexed ({', '.join(_formats())})")
+    return built
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build WebP/AVIF derivatives for generated images")
+    parser.add_argument("--force", action="store_true", help="Rebuild variants of unchanged files")
+    args = parser.parse_args()
+    build_all(force=args.force)
@@ -6,7 +6,7 @@ images.py — Генерація та підбір зображень для с
 2. Unsplash API — стокові фото як fallback
 
 Gemini free tier: 2 зображення/хвилину, 500/день
-Unsplash free tier: 50 запитів/годину
+Unsplash free tier: 50 запитів/годину — результати пошуку кешуються (unsplash_cache)
 """
 
 import base64
@@ -17,7 +17,15 @@ import urllib.request
 import urllib.error
 import urllib.parse
 
-from config import UNSPLASH_ACCESS_KEY, CATEGORY_IMAGE_QUERIES
+import quota
+import telemetry
+import unsplash_cache
+from image_reuse import find_reusable, remember
+from config import (
+    UNSPLASH_ACCESS_KEY, UNSPLASH_RESULTS_PER_QUERY, CATEGORY_IMAGE_QUERIES,
+    GEMINI_IMAGE_RPM_LIMIT, GEMINI_IMAGE_RPD_LIMIT, gemini_api_keys,
+)
+from ratelimit import KeyPool
 
 
 # ---------------------------------------------------------------------------
@@ -30,6 +38,50 @@ GEMINI_API_URL = (
     f"{GEMINI_IMAGE_MODEL}:generateContent"
 )
 
+# Per-key RPM/RPD accounting for image generation (separate quota from text models)
+_IMAGE_POOLS = {}
+
+
+def _image_pool():
+    """KeyPool Gemini-ключів для генерації зображень (None, якщо ключів немає)."""
+    keys = tuple(gemini_api_keys())
+    if not keys:
+        return None
+    if keys not in _IMAGE_POOLS:
+        _IMAGE_POOLS[keys] = KeyPool("Gemini image", keys, rpm=GEMINI_IMAGE_RPM_LIMIT,
+                                     rpd=GEMINI_IMAGE_RPD_LIMIT, max_concurrency=2, quota_api="gemini_image")
+    return _IMAGE_POOLS[keys]
+
+
+def _post_image_request(pool, payload):
+    """POST generateContent з найменш завантаженим ключем; на 429 — наступний ключ.
+    Повертає (result, http_status). Інші HTTP-помилки (і 429 останньої спроби) піднімаються."""
+    data = json.dumps(payload).encode("utf-8")
+    for attempt in range(len(pool) + 1):
+        api_key, limiter = pool.acquire()
+        if api_key is None:
+            ready = min(quota.available_at("gemini_image", key) for key in pool.keys)
+            raise RuntimeError(f"no Gemini key available for image generation until {ready:%Y-%m-%d %H:%M} UTC")
+        throttled = daily_exhausted = False
+        try:
+            req = urllib.request.Request(
+                f"{GEMINI_API_URL}?key={api_key}",
+                data=data,
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                return json.loads(resp.read().decode("utf-8")), resp.status
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == len(pool):
+                raise
+            throttled = True
+            daily_exhausted = "PerDay" in e.read().decode("utf-8", errors="replace")
+            print(f"   [RATE] Gemini image: 429 on key #{pool.keys.index(api_key) + 1}, trying another key")
+        finally:
+            limiter.release(throttled=throttled, daily_exhausted=daily_exhausted)
+
+
 # Prompt template for hemp industry images
 GEMINI_IMAGE_PROMPT = (
     "Generate a high-quality photo-realistic image for a news article. "
@@ -54,9 +106,8 @@ def generate_gemini_image(query, article_id="img"):
         local_path: абсолютний шлях до файлу
     Або None якщо помилка.
     """
-    api_key = os.environ.get("GEMINI_API_KEY", "")
-
-    if not api_key:
+    pool = _image_pool()
+    if not pool:
         print("[INFO] GEMINI_API_KEY not set, skipping Gemini image generation")
         return None
 
@@ -69,19 +120,11 @@ def generate_gemini_image(query, article_id="img"):
         },
     }
 
+    started = time.time()
+    http_status = None
     try:
-        url = f"{GEMINI_API_URL}?key={api_key}"
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-
         print(f"   🎨 Generating image via Gemini: {query[:60]}...")
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            result = json.loads(resp.read().decode("utf-8"))
+        result, http_status = _post_image_request(pool, payload)
 
         # Extract image from response
         parts = result.get("candidates", [{}])[0].get("content", {}).get("parts", [])
@@ -96,6 +139,7 @@ def generate_gemini_image(query, article_id="img"):
 
         if not image_b64:
             print("[WARN] Gemini returned no image data")
+            _record_image_call(started, "no_image", http_status, result)
             return None
 
         # Determine file extension
@@ -110,6 +154,7 @@ def generate_gemini_image(query, article_id="img"):
         filepath = os.path.join(gen_dir, filename)
 
         image_bytes = base64.b64decode(image_b64)
+        placeholder = {}
 
         if not image_bytes:
             print("[WARN] Gemini returned empty image data")
@@ -139,16 +184,19 @@ def generate_gemini_image(query, article_id="img"):
             _resample = getattr(Image, "LANCZOS", getattr(Image, "ANTIALIAS", Image.BICUBIC))
             img = img.resize((1280, 720), _resample)
 
-            # Save as optimized JPEG for smaller file size
+            # Lowest JPEG quality that still meets the SSIM target (encoded in memory)
+            from image_encoding import encode_jpeg
+            from image_placeholder import lqip_data_uri
+            image_bytes, quality, score = encode_jpeg(img)
+            placeholder = {"lqip": lqip_data_uri(img), "width": img.width, "height": img.height}
+
             ext = "jpg"
             filename = f"{article_id}.{ext}"
             filepath = os.path.join(gen_dir, filename)
-            img.save(filepath, "JPEG", quality=88, optimize=True)
-
-            with open(filepath, "rb") as f:
-                image_bytes = f.read()
+            with open(filepath, "wb") as f:
+                f.write(image_bytes)
 
-            print(f"   ✅ Image cropped to 16:9 (1280x720)")
+            print(f"   ✅ Image cropped to 16:9 (1280x720), JPEG q{quality} (SSIM {score:.3f})")
         except ImportError:
             print("   [INFO] Pillow not available, saving raw image")
             with open(filepath, "wb") as f:
@@ -156,6 +204,14 @@ def generate_gemini_image(query, article_id="img"):
 
         size_kb = len(image_bytes) / 1024
         print(f"   ✅ Gemini image saved: {filepath} ({size_kb:.0f} KB)")
+        _record_image_call(started, "ok", http_status, result)
+
+        # WebP/AVIF srcset derivatives (non-critical: the original is always served)
+        try:
+            from image_variants import build_variants
+            build_variants(filepath)
+        except Exception as e:
+            print(f"   [WARN] Image variants failed (non-critical): {e}")
 
         # Return image_data compatible dict
         # Hugo uses relative path from static/
@@ -172,6 +228,7 @@ def generate_gemini_image(query, article_id="img"):
             "unsplash_url": "",
             "source": "gemini",
             "local_path": relative_path,
+            **placeholder,
         }
 
     except urllib.error.HTTPError as e:
@@ -181,29 +238,37 @@ def generate_gemini_image(query, article_id="img"):
         except Exception:
             pass
         print(f"[WARN] Gemini image API error {e.code}: {error_body}")
+        _record_image_call(started, "http_error", e.code)
         return None
     except Exception as e:
         print(f"[WARN] Gemini image generation failed: {e}")
+        _record_image_call(started, "network_error" if http_status is None else "parse_error", http_status)
         return None
 
 
+def _record_image_call(started, outcome, http_status, result=None):
+    """Телеметрія виклику генерації зображення (data/llm_telemetry.jsonl)."""
+    meta = (result or {}).get("usageMetadata") or {}
+    telemetry.record(
+        "image", GEMINI_IMAGE_MODEL, outcome,
+        latency=time.time() - started,
+        http_status=http_status,
+        usage={
+            "input_tokens": meta.get("promptTokenCount", 0),
+            "output_tokens": meta.get("candidatesTokenCount", 0),
+        },
+    )
+
+
 # ---------------------------------------------------------------------------
 # Unsplash (fallback)
 # ---------------------------------------------------------------------------
 
 
-def get_unsplash_image(query, fallback_category="інше"):
+def search_unsplash(query):
     """
-    Шукає зображення на Unsplash за запитом.
-
-    Повертає dict з ключами:
-        url: URL зображення (regular size, ~1080px)
-        thumb: URL мініатюри
-        author: Ім'я фотографа
-        author_url: Посилання на профіль
-        unsplash_url: Посилання на фото на Unsplash
-        source: "unsplash"
-    Або None якщо помилка.
+    Живий пошук Unsplash (до UNSPLASH_RESULTS_PER_QUERY фото).
+    Повертає список image_data (можливо порожній) або None, якщо ключа немає чи API недоступне.
     """
     access_key = os.environ.get("UNSPLASH_ACCESS_KEY", UNSPLASH_ACCESS_KEY)
 
@@ -211,13 +276,17 @@ def get_unsplash_image(query, fallback_category="інше"):
         print("[WARN] UNSPLASH_ACCESS_KEY not set, skipping image")
         return None
 
+    wait = quota.try_consume("unsplash")
+    if wait > 0:
+        print(f"[RATE] Unsplash hourly quota used up, next search in {wait / 60:.0f} min")
+        return None
+
     # Build search URL
-    search_query = query or CATEGORY_IMAGE_QUERIES.get(fallback_category, "hemp plant")
-    encoded_query = urllib.parse.quote(search_query)
+    encoded_query = urllib.parse.quote(query)
     url = (
         f"https://api.unsplash.com/search/photos"
         f"?query={encoded_query}"
-        f"&per_page=1"
+        f"&per_page={UNSPLASH_RESULTS_PER_QUERY}"
         f"&orientation=landscape"
         f"&content_filter=high"
     )
@@ -234,45 +303,79 @@ def get_unsplash_image(query, fallback_category="інше"):
         with urllib.request.urlopen(req, timeout=10) as resp:
             data = json.loads(resp.read().decode("utf-8"))
 
-        results = data.get("results", [])
-        if not results:
-            print(f"[WARN] No Unsplash images found for: {search_query}")
-            # Try fallback category query
-            if query and fallback_category:
-                fallback_query = CATEGORY_IMAGE_QUERIES.get(
-                    fallback_category, "hemp plant industrial"
-                )
-                if fallback_query != query:
-                    print(f"[INFO] Trying fallback query: {fallback_query}")
-                    return get_unsplash_image(fallback_query, fallback_category=None)
-            return None
-
-        photo = results[0]
-
-        image_data = {
-            "url": photo["urls"]["regular"],
-            "thumb": photo["urls"]["small"],
-            "author": photo["user"]["name"],
-            "author_url": photo["user"]["links"]["html"],
-            "unsplash_url": photo["links"]["html"],
-            "download_url": photo["links"]["download_location"],
-            "source": "unsplash",
-        }
-
-        # Trigger download event (required by Unsplash API guidelines)
-        _trigger_download(image_data["download_url"], access_key)
-
-        print(f"   ✅ Unsplash image: {search_query} → by {image_data['author']}")
-        return image_data
+        return [
+            {
+                "url": photo["urls"]["regular"],
+                "thumb": photo["urls"]["small"],
+                "author": photo["user"]["name"],
+                "author_url": photo["user"]["links"]["html"],
+                "unsplash_url": photo["links"]["html"],
+                "download_url": photo["links"]["download_location"],
+                "source": "unsplash",
+                "width": photo.get("width"),
+                "height": photo.get("height"),
+            }
+            for photo in data.get("results", [])
+        ]
 
     except urllib.error.HTTPError as e:
         print(f"[WARN] Unsplash API error: {e.code}")
+        if e.code in (403, 429):  # Unsplash answers 403 "Rate Limit Exceeded"
+            quota.exhaust("unsplash", retry_after=3600)
         return None
     except Exception as e:
         print(f"[WARN] Unsplash request failed: {e}")
         return None
 
 
+def _unsplash_photo(query):
+    """Фото для запиту: з кешу (unsplash_cache), інакше живий пошук з записом у кеш.
+    Повертає (image_data або None, from_cache)."""
+    hit, image_data = unsplash_cache.take(query)
+    if hit:
+        return image_data, True
+    results = search_unsplash(query)
+    if results is None:
+        return None, False
+    unsplash_cache.store(query, results)
+    return unsplash_cache.take(query)[1], False
+
+
+def get_unsplash_image(query, fallback_category="інше"):
+    """
+    Шукає зображення на Unsplash за запитом (спершу в кеші результатів).
+
+    Повертає dict з ключами:
+        url: URL зображення (regular size, ~1080px)
+        thumb: URL мініатюри
+        author: Ім'я фотографа
+        author_url: Посилання на профіль
+        unsplash_url: Посилання на фото на Unsplash
+        source: "unsplash"
+    Або None якщо помилка.
+    Якщо за запитом нічого немає — фото з пулу категорії (зазвичай уже в кеші).
+    """
+    search_query = query or CATEGORY_IMAGE_QUERIES.get(fallback_category, "hemp plant")
+    image_data, from_cache = _unsplash_photo(search_query)
+
+    if not image_data and query and fallback_category:
+        fallback_query = CATEGORY_IMAGE_QUERIES.get(fallback_category, "hemp plant industrial")
+        if fallback_query != query:
+            print(f"[WARN] No Unsplash images for: {search_query}, using category pool: {fallback_query}")
+            image_data, from_cache = _unsplash_photo(fallback_query)
+            search_query = fallback_query
+
+    if not image_data:
+        print(f"[WARN] No Unsplash images found for: {search_query}")
+        return None
+
+    # Trigger download event (required by Unsplash API guidelines)
+    _trigger_download(image_data["download_url"], os.environ.get("UNSPLASH_ACCESS_KEY", UNSPLASH_ACCESS_KEY))
+
+    print(f"   ✅ Unsplash image{' (cached)' if from_cache else ''}: {search_query} → by {image_data['author']}")
+    return image_data
+
+
 def _trigger_download(download_url, access_key):
     """Повідомляє Unsplash про використання фото (обов'язково за правилами API)."""
     try:
@@ -299,10 +402,21 @@ def get_article_image(query, fallback_category="інше", article_id="img"):
     article_id: ID статті для назви файлу
 
     Повертає image_data dict або None.
+    Близький попередній запит тієї ж категорії повертає вже наявне зображення (image_reuse).
     """
+    # 0. Reuse an earlier image for an (almost) identical query
+    image_data = find_reusable(query, fallback_category)
+    if image_data:
+        if image_data.get("source") == "unsplash" and image_data.get("download_url"):
+            # Unsplash guidelines: every use of a photo is reported
+            _trigger_download(image_data["download_url"],
+                              os.environ.get("UNSPLASH_ACCESS_KEY", UNSPLASH_ACCESS_KEY))
+        return image_data
+
     # 1. Try Gemini Image Generation
     image_data = generate_gemini_image(query, article_id=article_id)
     if image_data:
+        remember(query, fallback_category, image_data)
         return image_data
 
     # Small delay before fallback to avoid rate issues
@@ -311,6 +425,7 @@ def get_article_image(query, fallback_category="інше", article_id="img"):
     # 2. Fallback to Unsplash
     print("   🔄 Falling back to Unsplash...")
     image_data = get_unsplash_image(query, fallback_category=fallback_category)
+    remember(query, fallback_category, image_data)
     return image_data
 
 
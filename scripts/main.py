@@ -5,19 +5,25 @@ main.py — KONOPLA.UA News Pipeline
 Two modes:
   --action discover  (default) — fetch RSS, save raw candidates to candidates.json (no AI)
   --action process --ids id1,id2 — rewrite selected candidates via Gemini, create draft .md files
+      add --batch to submit all rewrites as one asynchronous Gemini batch job
+      add --merge-clusters to rewrite each story cluster as one multi-source article
 """
 
 import argparse
 import os
+import re
 import sys
 import time
 import traceback
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from config import API_DELAY_SECONDS, load_sources
+from config import (
+    IMAGE_PREFETCH_WORKERS, IMAGE_PROBE_MAX_CANDIDATES, REWRITE_MAX_CONCURRENCY, gemini_api_keys, load_sources,
+)
 from utils import load_json, save_json
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -67,6 +73,12 @@ def _fetch_youtube_metadata(video_id: str):
         f"?part=snippet,statistics&id={video_id}&key={api_key}"
     )
 
+    import quota
+    from config import YOUTUBE_UNIT_COSTS
+    if quota.try_consume("youtube", cost=YOUTUBE_UNIT_COSTS["videos"]) > 0:
+        print(f"   [WARN] YouTube units exhausted until {quota.available_at('youtube'):%Y-%m-%d %H:%M} UTC")
+        return None
+
     try:
         req = Request(url, headers={"Accept": "application/json"})
         with urlopen(req, timeout=15) as resp:
@@ -105,8 +117,12 @@ def _fetch_youtube_metadata(video_id: str):
 # Mode 1: discover
 # ---------------------------------------------------------------------------
 
-def run_discover(region='all'):
-    """Fetch RSS feeds and save raw candidates. No AI calls required."""
+def run_discover(region='all', triage=False):
+    """Fetch RSS feeds and save raw candidates.
+
+    No AI calls by default. triage=True sends new candidates through one compact
+    LLM triage request per batch and stores the verdicts on candidates.json items.
+    """
     from fetcher import fetch_all_feeds, load_processed
     from monitor import send_pipeline_report, send_crash_alert
     from relevance import compute_relevance, is_source_trusted, guess_category
@@ -145,6 +161,7 @@ def run_discover(region='all'):
     processed_hashes = set(processed.get("articles", []))
 
     new_count = 0
+    new_items = []
     for article in articles:
         h = article["hash"]
         if h in existing_hashes or h in processed_hashes:
@@ -173,6 +190,8 @@ def run_discover(region='all'):
             "source": article["source"],
             "summary": article.get("summary", "")[:500],
             "image_url": first_image,
+            # All feed images: the best one is picked by probing in run_process
+            "image_urls": [img["url"] for img in article.get("source_images", [])[:IMAGE_PROBE_MAX_CANDIDATES]],
             "date": article["date"],
             "hash": h,
             "content_preview": content_text[:300],
@@ -183,12 +202,59 @@ def run_discover(region='all'):
             "category_hint": guess_category(article["title"], content_text),
         }
         candidates.setdefault("items", []).append(candidate)
+        new_items.append(candidate)
         existing_hashes.add(h)
         new_count += 1
 
+    # Local classifier (no API calls): down-rank obvious rejects, keep them out of LLM triage
+    to_triage = new_items
+    try:
+        from classifier import predict
+        local_rejects = 0
+        for candidate in new_items:
+            verdict = predict(candidate)
+            if verdict is None:
+                break  # no trained model yet
+            candidate["local_relevance"] = verdict
+            candidate["relevance_score"] = round((candidate["relevance_score"] + verdict["p_relevant"]) / 2, 2)
+            candidate["relevance_reasons"].append(f"local model p={verdict['p_relevant']:.2f}")
+            local_rejects += verdict["reject"]
+        else:
+            if new_items:
+                print(f"[INFO] Local classifier: {local_rejects}/{len(new_items)} obvious rejects")
+        to_triage = [c for c in new_items if not (c.get("local_relevance") or {}).get("reject")]
+    except Exception as e:
+        print(f"[WARN] Local classifier failed (non-critical): {e}")
+
+    if triage and to_triage:
+        try:
+            from triage import triage_candidates
+            from classifier import log_rejection
+            verdicts = triage_candidates(to_triage)
+            for candidate in to_triage:
+                if candidate["id"] in verdicts:
+                    candidate["triage"] = verdicts[candidate["id"]]
+                    # Ranking/flag only: the editor still decides what gets processed
+                    candidate["relevance_score"] = round(
+                        (candidate["relevance_score"] + candidate["triage"]["relevance"]) / 2, 2)
+                    candidate["relevance_reasons"].append(f"triage {candidate['triage']['relevance']:.2f}")
+                    if candidate["triage"]["reject"]:
+                        log_rejection(candidate, candidate["triage"]["reason"], stage="triage")
+        except Exception as e:
+            print(f"[WARN] LLM triage failed (non-critical): {e}")
+
     # Cleanup: remove old candidates and enforce max size
     candidates["items"] = _cleanup_candidates(candidates.get("items", []))
 
+    # Group multi-source coverage of the same story (re-computed over the whole list)
+    try:
+        from clustering import assign_clusters
+        clusters = assign_clusters(candidates["items"])
+        if clusters:
+            print(f"[INFO] Story clusters: {clusters}")
+    except Exception as e:
+        print(f"[WARN] Story clustering failed (non-critical): {e}")
+
     save_json(CANDIDATES_FILE, candidates)
 
     duration = time.time() - start_time
@@ -226,22 +292,30 @@ def _cleanup_candidates(items):
 # Mode 2: process
 # ---------------------------------------------------------------------------
 
-def run_process(ids):
-    """Process selected candidates: scrape, rewrite, create draft .md files."""
+def run_process(ids, batch=False, merge_clusters=False):
+    """Process selected candidates: scrape, rewrite, create draft .md files.
+
+    batch=True — rewrite via one Gemini Batch Mode job instead of interactive calls.
+    merge_clusters=True — candidates of one story cluster (see clustering.py) are
+    rewritten as a single article from all their sources; the rest are marked processed.
+    """
 
     # Validate required API keys
-    if not os.environ.get("GEMINI_API_KEY") and not os.environ.get("OPENROUTER_API_KEY"):
-        print("[CRITICAL] Neither GEMINI_API_KEY nor OPENROUTER_API_KEY is set — aborting")
+    if not gemini_api_keys() and not os.environ.get("OPENROUTER_API_KEY"):
+        print("[CRITICAL] Neither GEMINI_API_KEY(S) nor OPENROUTER_API_KEY is set — aborting")
         return 1
 
     try:
         from fetcher import load_processed, save_processed
         from scraper import scrape_article_full
-        from rewriter import rewrite_article
+        from rewriter import build_cluster_content, rewrite_many, rewrite_articles_batch
         from images import get_article_image
+        from image_localizer import localize_image
+        from image_placeholder import add_placeholder
         from publisher import create_article_file
         from telegram_bot import send_message, ADMIN_CHAT_ID
         from monitor import send_crash_alert
+        from classifier import log_rejection, predict
     except ImportError as e:
         print(f"[CRITICAL] Missing dependency: {e}")
         return 1
@@ -291,105 +365,99 @@ def run_process(ids):
         else:
             print(f"[WARN] Candidate ID not found in candidates.json or workflow.json: {cid}")
 
+    if merge_clusters:
+        # Pull in the other sources of every selected cluster
+        selected = {c["id"] for c in to_process}
+        cluster_ids = {c["cluster_id"] for c in to_process if c.get("cluster_id")}
+        for c in candidates.get("items", []):
+            if c.get("cluster_id") in cluster_ids and c["id"] not in selected:
+                print(f"[INFO] Adding cluster source {c['id']} ({c.get('source', '')})")
+                to_process.append(c)
+                selected.add(c["id"])
+
     if not to_process:
         print("[INFO] No valid candidates to process.")
         return 0
 
     processed = load_processed()
     processed_ids = []
+    image_executor = ThreadPoolExecutor(max_workers=IMAGE_PREFETCH_WORKERS)
 
     rewritten_count = 0
     failed_count = 0
     skipped_count = 0
 
     try:
+        # --- Phase 1: scrape / compose rewrite input (sequential, polite to origins) ---
+        jobs = []
         for i, candidate in enumerate(to_process):
             print(f"\n{'='*40}")
             print(f"Article {i+1}/{len(to_process)}")
             print(f"   Title: {candidate['title'][:70]}...")
 
-            # --- Check if this is a YouTube URL ---
-            yt_video_id = _extract_youtube_id(candidate["link"])
-            yt_metadata = None
-            if yt_video_id:
-                print(f"   🎬 YouTube video detected: {yt_video_id}")
-                yt_metadata = _fetch_youtube_metadata(yt_video_id)
-                if yt_metadata:
-                    print(f"   Channel: {yt_metadata['channel']}, Views: {yt_metadata['views']}")
-
-            # --- Scrape full text ---
-            content = candidate.get("content_preview", "")
-            scraped_images = []
-            scraped_og_image = ""
-
-            if yt_metadata:
-                # For YouTube: compose content from API metadata (don't scrape)
-                video_url = f"https://www.youtube.com/watch?v={yt_video_id}"
-                content = (
-                    f"Це YouTube відео про промислові коноплі.\n\n"
-                    f"Назва: {yt_metadata['title']}\n"
-                    f"Канал: {yt_metadata['channel']}\n"
-                    f"Опис: {yt_metadata['description'][:2000]}\n"
-                    f"Переглядів: {yt_metadata['views']}\n"
-                    f"Посилання: {video_url}\n\n"
-                    f"ВАЖЛИВО: Це відео, а не текстова стаття. "
-                    f"Напиши анонс/огляд цього відео для сайту Konopla.UA. "
-                    f"Зазнач що це відео і хто його автор. Заохоть читача переглянути відео на сайті."
-                )
-                scraped_og_image = yt_metadata["thumbnail"]
-                print(f"   Video content composed: {len(content)} chars")
-            elif len(content) < 2000:
-                # Regular article: try scraping
-                try:
-                    print("   Scraping full text...")
-                    scrape_result = scrape_article_full(candidate["link"])
-                    if scrape_result and scrape_result.get("text") and len(scrape_result["text"]) > len(content):
-                        content = scrape_result["text"]
-                        scraped_images = scrape_result.get("images", [])
-                        scraped_og_image = scrape_result.get("og_image", "")
-                        print(f"   Scraped: {len(content)} chars, {len(scraped_images)} images, og_image: {'yes' if scraped_og_image else 'no'}")
-                    else:
-                        print(f"   [WARN] Scrape returned no usable content from {candidate['link'][:60]}")
-                except Exception as e:
-                    print(f"   Scrape error: {e}")
-                time.sleep(1)
+            # Discover-time verdicts only rank candidates: the editor chose this one, so they are only logged
+            triage = candidate.get("triage") or {}
+            if triage.get("reject"):
+                print(f"   [INFO] Triage flagged it as irrelevant ({triage.get('reason', '')}), processing anyway")
 
-            # If content is too short, mark as failed and skip (not for YouTube)
-            if len(content) < 200 and not yt_video_id:
-                print(f"   [ERROR] Insufficient content ({len(content)} chars) — cannot rewrite")
-                print(f"   The source page may require JS, have a paywall, or block bots")
+            local = candidate.get("local_relevance") or (predict(candidate) if candidate.get("hash") else None) or {}
+            if local.get("reject"):
+                print(f"   [INFO] Local classifier scores it low (p_relevant={local['p_relevant']:.2f}), processing anyway")
+
+            job = _prepare_candidate(candidate, scrape_article_full)
+            if job is None:
                 failed_count += 1
-                # Update workflow: mark as needing manual URL
-                _update_workflow_status(
-                    candidate.get("id", ""),
-                    status="scrape_failed",
-                    stage="feed",
-                )
                 continue
-
-            # --- Rewrite via AI ---
-            rewritten = None
-            try:
-                print("   Rewriting...")
-                source_images = []
-                if candidate.get("image_url"):
-                    source_images = [{"url": candidate["image_url"], "alt": ""}]
-                elif scraped_og_image:
-                    source_images = [{"url": scraped_og_image, "alt": ""}]
-                elif scraped_images:
-                    source_images = scraped_images[:3]
-
-                is_manual = not candidate.get("hash")
-                rewritten = rewrite_article(
-                    title=candidate["title"],
-                    summary=candidate.get("summary", ""),
-                    source_url=candidate["link"],
-                    content=content,
-                    source_images=source_images,
-                    force_relevant=is_manual,
+            jobs.append(job)
+
+        if merge_clusters:
+            jobs = _merge_cluster_jobs(jobs, build_cluster_content)
+
+        # --- Image prefetch: generation/Unsplash runs alongside the rewrite ---
+        for job in jobs:
+            if _needs_generated_image(job):
+                job["image_future"] = image_executor.submit(
+                    get_article_image,
+                    query=_image_seed_query(job["candidate"]),
+                    fallback_category=job["candidate"].get("category_hint") or "інше",
+                    article_id=job["article_id"],
                 )
-            except Exception as e:
-                print(f"   Rewrite error: {e}")
+        prefetching = sum(1 for job in jobs if job.get("image_future"))
+        if prefetching:
+            print(f"\n[INFO] Prefetching {prefetching} images while rewriting")
+
+        # --- Phase 2: concurrent rewrite via shared rate limiters ---
+        results = []
+        if jobs and batch:
+            print(f"\n{'='*40}")
+            print(f"Rewriting {len(jobs)} articles via Gemini batch job...")
+            results = rewrite_articles_batch([job["rewrite_kwargs"] for job in jobs])
+        elif jobs:
+            print(f"\n{'='*40}")
+            in_flight = REWRITE_MAX_CONCURRENCY * max(1, len(gemini_api_keys()))
+            print(f"Rewriting {len(jobs)} articles (up to {in_flight} in flight)...")
+            results = rewrite_many([job["rewrite_kwargs"] for job in jobs])
+
+        # --- Phase 3: images, drafts, workflow — strictly in input order ---
+        for i, (job, rewritten) in enumerate(zip(jobs, results)):
+            candidate = job["candidate"]
+            yt_video_id = job["yt_video_id"]
+            yt_metadata = job["yt_metadata"]
+            source_image = job["source_image"]
+
+            print(f"\n{'='*40}")
+            print(f"Result {i+1}/{len(jobs)}: {candidate['title'][:60]}...")
+
+            # Merged cluster sources share the fate of the primary candidate
+            members = job.get("members", [])
+            for member in members:
+                if member.get("hash"):
+                    processed["articles"].append(member["hash"])
+                processed_ids.append(member["id"])
+
+            if not rewritten or rewritten.get("rejected"):
+                if job.get("image_future"):
+                    job["image_future"].cancel()  # not started yet: save the quota
 
             if not rewritten:
                 print("   Skipping — rewrite failed (API error)")
@@ -404,12 +472,15 @@ def run_process(ids):
                 print("   Skipping — AI rejected as irrelevant")
                 skipped_count += 1
                 if candidate.get("hash"):
+                    log_rejection(candidate, rewritten.get("reason", ""), stage="rewrite")
                     processed["articles"].append(candidate["hash"])
                 save_processed(processed)
                 processed_ids.append(candidate["id"])
                 continue
 
             print(f"   OK: {rewritten['title'][:60]}...")
+            if members:
+                rewritten["extra_sources"] = [{"name": m.get("source", ""), "url": m["link"]} for m in members]
 
             # --- YouTube: set video-specific fields ---
             if yt_video_id:
@@ -421,7 +492,7 @@ def run_process(ids):
                 print(f"   🎬 youtube_id={yt_video_id}, category=відео")
 
             # --- Get image: prefer original source, fallback to Unsplash/Gemini ---
-            article_id = uuid.uuid4().hex[:12]
+            article_id = job["article_id"]
             image_data = None
 
             # YouTube: use thumbnail
@@ -433,33 +504,23 @@ def run_process(ids):
                     "author_url": "",
                 }
                 print(f"   Using YouTube thumbnail")
-            elif candidate.get("image_url"):
-                image_data = {
-                    "url": candidate["image_url"],
-                    "source": "original",
-                    "author": "",
-                    "author_url": "",
-                }
-                print(f"   Using source image: {candidate['image_url'][:60]}...")
-
-            # Fallback: use og:image or first scraped image from the page
-            if not image_data and scraped_og_image:
+            elif source_image:
+                # Best of feed / og:image / page images, chosen by image_probe in _prepare_candidate
                 image_data = {
-                    "url": scraped_og_image,
+                    "url": source_image,
                     "source": "original",
                     "author": "",
                     "author_url": "",
                 }
-                print(f"   Using scraped og:image: {scraped_og_image[:60]}...")
+                print(f"   Using source image: {source_image[:60]}...")
 
-            if not image_data and scraped_images:
-                image_data = {
-                    "url": scraped_images[0]["url"],
-                    "source": "original",
-                    "author": "",
-                    "author_url": "",
-                }
-                print(f"   Using scraped page image: {scraped_images[0]['url'][:60]}...")
+            if not image_data and job.get("image_future"):
+                try:
+                    image_data = job["image_future"].result()
+                    if image_data:
+                        print(f"   Using prefetched image ({image_data.get('source', '')})")
+                except Exception as e:
+                    print(f"   Image prefetch error (non-critical): {e}")
 
             if not image_data:
                 try:
@@ -474,6 +535,10 @@ def run_process(ids):
                 except Exception as e:
                     print(f"   Image error (non-critical): {e}")
 
+            # Hotlinked source image → optimized local copy (kept remote on failure)
+            image_data = localize_image(image_data)
+            image_data = add_placeholder(image_data)
+
             # --- Create draft Hugo .md file ---
             print("   Creating draft article...")
             filepath = create_article_file(
@@ -531,10 +596,6 @@ def run_process(ids):
             # Save after each article
             save_processed(processed)
 
-            if i < len(to_process) - 1:
-                print(f"   Waiting {API_DELAY_SECONDS}s...")
-                time.sleep(API_DELAY_SECONDS)
-
     except Exception as e:
         error_msg = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
         print(f"\n[CRITICAL] Pipeline crashed: {error_msg}")
@@ -544,8 +605,11 @@ def run_process(ids):
             pass
         # Still remove successfully processed candidates before returning
         _remove_processed_candidates(processed_ids)
+        image_executor.shutdown(wait=False, cancel_futures=True)
         return 1
 
+    image_executor.shutdown(wait=False)
+
     # Remove processed candidates from candidates.json
     _remove_processed_candidates(processed_ids)
 
@@ -562,6 +626,153 @@ def run_process(ids):
     return 0
 
 
+def _prepare_candidate(candidate, scrape_article_full):
+    """Scrape full text (or compose YouTube context) and build rewrite_article kwargs.
+
+    Returns a job dict, or None if there is not enough content to rewrite
+    (the workflow entry is then marked scrape_failed).
+    """
+    # --- Check if this is a YouTube URL ---
+    yt_video_id = _extract_youtube_id(candidate["link"])
+    yt_metadata = None
+    if yt_video_id:
+        print(f"   🎬 YouTube video detected: {yt_video_id}")
+        yt_metadata = _fetch_youtube_metadata(yt_video_id)
+        if yt_metadata:
+            print(f"   Channel: {yt_metadata['channel']}, Views: {yt_metadata['views']}")
+
+    # --- Scrape full text ---
+    content = candidate.get("content_preview", "")
+    scraped_images = []
+    scraped_og_image = ""
+
+    if yt_metadata:
+        # For YouTube: compose content from API metadata (don't scrape)
+        video_url = f"https://www.youtube.com/watch?v={yt_video_id}"
+        content = (
+            f"Це YouTube відео про промислові коноплі.\n\n"
+            f"Назва: {yt_metadata['title']}\n"
+            f"Канал: {yt_metadata['channel']}\n"
+            f"Опис: {yt_metadata['description'][:2000]}\n"
+            f"Переглядів: {yt_metadata['views']}\n"
+            f"Посилання: {video_url}\n\n"
+            f"ВАЖЛИВО: Це відео, а не текстова стаття. "
+            f"Напиши анонс/огляд цього відео для сайту Konopla.UA. "
+            f"Зазнач що це відео і хто його автор. Заохоть читача переглянути відео на сайті."
+        )
+        scraped_og_image = yt_metadata["thumbnail"]
+        print(f"   Video content composed: {len(content)} chars")
+    elif len(content) < 2000:
+        # Regular article: try scraping
+        try:
+            print("   Scraping full text...")
+            scrape_result = scrape_article_full(candidate["link"])
+            if scrape_result and scrape_result.get("text") and len(scrape_result["text"]) > len(content):
+                content = scrape_result["text"]
+                scraped_images = scrape_result.get("images", [])
+                scraped_og_image = scrape_result.get("og_image", "")
+                print(f"   Scraped: {len(content)} chars, {len(scraped_images)} images, og_image: {'yes' if scraped_og_image else 'no'}")
+            else:
+                print(f"   [WARN] Scrape returned no usable content from {candidate['link'][:60]}")
+        except Exception as e:
+            print(f"   Scrape error: {e}")
+        time.sleep(1)
+
+    # If content is too short, mark as failed and skip (not for YouTube)
+    if len(content) < 200 and not yt_video_id:
+        print(f"   [ERROR] Insufficient content ({len(content)} chars) — cannot rewrite")
+        print(f"   The source page may require JS, have a paywall, or block bots")
+        # Update workflow: mark as needing manual URL
+        _update_workflow_status(
+            candidate.get("id", ""),
+            status="scrape_failed",
+            stage="feed",
+        )
+        return None
+
+    # --- Pick the source image: probe every option by its first bytes ---
+    from image_probe import choose_image
+    if yt_video_id:
+        source_image = candidate.get("image_url") or scraped_og_image
+    else:
+        options = ([candidate.get("image_url", "")] + candidate.get("image_urls", [])
+                   + [scraped_og_image] + [img["url"] for img in scraped_images])
+        source_image, probes = choose_image(options)
+        if probes:
+            sizes = ", ".join(f"{p['width']}x{p['height']} {p['type']}" if p["width"] else p["type"] for p in probes)
+            print(f"   Probed {len(probes)} images ({sizes}) → {source_image[:60] or 'none usable'}")
+    source_images = [{"url": source_image, "alt": ""}] if source_image else []
+
+    return {
+        "candidate": candidate,
+        "article_id": uuid.uuid4().hex[:12],
+        "yt_video_id": yt_video_id,
+        "yt_metadata": yt_metadata,
+        "source_image": source_image,
+        "rewrite_kwargs": {
+            "title": candidate["title"],
+            "summary": candidate.get("summary", ""),
+            "source_url": candidate["link"],
+            "content": content,
+            "source_images": source_images,
+            "force_relevant": not candidate.get("hash"),
+            "content_type": "video" if yt_metadata else ("manual" if not candidate.get("hash") else "news"),
+        },
+    }
+
+
+def _needs_generated_image(job):
+    """True if the article will have no source image (none usable among feed/og/page images, not YouTube)."""
+    return not (job["yt_video_id"] or job["source_image"])
+
+
+def _image_seed_query(candidate):
+    """Image query before the rewrite exists: the source title without the " - Publisher" suffix."""
+    return re.sub(r"\s+[-–—]\s+[^-–—]{2,40}$", "", candidate.get("title", "")).strip()
+
+
+def _merge_cluster_jobs(jobs, build_cluster_content):
+    """Collapse jobs of one story cluster into a single multi-source rewrite job.
+
+    The cluster representative (or the first scraped member) becomes the primary
+    candidate: its title, link and images are used; the rest go to job["members"].
+    """
+    groups = {}
+    for job in jobs:
+        cluster_id = job["candidate"].get("cluster_id")
+        if cluster_id and not job["yt_video_id"]:
+            groups.setdefault(cluster_id, []).append(job)
+
+    merged = []
+    seen = set()
+    for job in jobs:
+        group = groups.get(job["candidate"].get("cluster_id")) if not job["yt_video_id"] else None
+        if not group or len(group) < 2:
+            merged.append(job)
+            continue
+        cluster_id = job["candidate"]["cluster_id"]
+        if cluster_id in seen:
+            continue
+        seen.add(cluster_id)
+
+        primary = next((j for j in group if j["candidate"].get("cluster_representative")), group[0])
+        ordered = [primary] + [j for j in group if j is not primary]
+        content = build_cluster_content([
+            {
+                "title": j["candidate"]["title"],
+                "source": j["candidate"].get("source", ""),
+                "link": j["candidate"]["link"],
+                "content": j["rewrite_kwargs"]["content"],
+            }
+            for j in ordered
+        ])
+        primary["rewrite_kwargs"] = dict(primary["rewrite_kwargs"], content=content, content_type="cluster")
+        primary["members"] = [j["candidate"] for j in ordered[1:]]
+        print(f"[INFO] Cluster {cluster_id}: {len(group)} sources merged into one rewrite")
+        merged.append(primary)
+    return merged
+
+
 def _remove_processed_candidates(processed_ids):
     """Remove processed candidates from candidates.json."""
     if not processed_ids:
@@ -618,11 +829,17 @@ def _add_to_workflow(article_id, filename, rewritten, candidate, image_data):
         existing["image"] = image_data.get("url", "") if image_data else ""
         existing["stage"] = "editorial"
         existing["status"] = "ready_for_edit"
+        if candidate.get("hash"):  # fresh from candidates.json: the preview is still source text
+            existing["content_preview"] = (candidate.get("content_preview") or candidate.get("summary", ""))[:300]
         existing["channels"] = {
             "website": {"enabled": True, "status": "pending", "scheduled_at": None},
             "telegram": {"enabled": True, "status": "pending", "scheduled_at": None, "custom_text": rewritten.get("telegram_hook", "")},
             "threads": {"enabled": True, "status": "pending", "scheduled_at": None, "custom_text": rewritten.get("threads_hook", "")},
         }
+        if rewritten.get("_usage"):
+            existing["llm_usage"] = rewritten["_usage"]
+        if rewritten.get("extra_sources"):
+            existing["extra_sources"] = rewritten["extra_sources"]
         existing["updated_at"] = now_iso
         print(f"   Updated existing workflow entry for candidate {cand_id}")
     else:
@@ -637,6 +854,7 @@ def _add_to_workflow(article_id, filename, rewritten, candidate, image_data):
             "candidate_id": cand_id,
             "original_title": candidate.get("title", ""),
             "original_url": candidate.get("link", ""),
+            "content_preview": (candidate.get("content_preview") or candidate.get("summary", ""))[:300],
             "stage": "editorial",
             "status": "ready_for_edit",
             "channels": {
@@ -648,6 +866,10 @@ def _add_to_workflow(article_id, filename, rewritten, candidate, image_data):
             "updated_at": now_iso,
             "published_at": None,
         }
+        if rewritten.get("_usage"):
+            entry["llm_usage"] = rewritten["_usage"]
+        if rewritten.get("extra_sources"):
+            entry["extra_sources"] = rewritten["extra_sources"]
         workflow["articles"].append(entry)
 
     save_json(WORKFLOW_FILE, workflow)
@@ -673,16 +895,28 @@ if __name__ == "__main__":
         choices=["all", "global", "ua"],
         help="Which sources to scan: all (default) | global | ua",
     )
+    parser.add_argument(
+        "--triage", action="store_true",
+        help="discover mode: LLM triage of new candidates (relevance, category, reject)",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="process mode: submit all rewrites as one Gemini Batch Mode job",
+    )
+    parser.add_argument(
+        "--merge-clusters", action="store_true",
+        help="process mode: rewrite each story cluster as one article from all its sources",
+    )
     args = parser.parse_args()
 
     if args.action == "discover":
-        exit_code = run_discover(region=args.region)
+        exit_code = run_discover(region=args.region, triage=args.triage)
     elif args.action == "process":
         if not args.ids:
             print("[ERROR] --ids is required for process mode")
             sys.exit(1)
         id_list = [x.strip() for x in args.ids.split(",") if x.strip()]
-        exit_code = run_process(id_list)
+        exit_code = run_process(id_list, batch=args.batch, merge_clusters=args.merge_clusters)
     else:
         print(f"[ERROR] Unknown action: {args.action}")
         exit_code = 1
@@ -188,6 +188,13 @@ def create_article_file(article_data, source_url, source_name, image_data=None,
         if image_data:
             safe_url = image_data["url"].replace(chr(34), chr(39))
             image_line = f'image: "{safe_url}"'
+            if image_data.get("original_url"):
+                # Localized copy (image_localizer): keep where it came from
+                image_line += f'\nimage_original_url: "{image_data["original_url"].replace(chr(34), chr(39))}"'
+            if image_data.get("lqip"):
+                # Placeholder + intrinsic size (image_placeholder): no layout shift
+                from image_placeholder import front_matter_lines
+                image_line += "\n" + "\n".join(front_matter_lines(image_data))
             img_source = image_data.get("source", "unsplash")
             if img_source == "gemini":
                 image_credit = (
@@ -225,6 +232,13 @@ def create_article_file(article_data, source_url, source_name, image_data=None,
         youtube_id = article_data.get("youtube_id", "")
         if youtube_id:
             fm_lines.append(f'youtube_id: "{youtube_id}"')
+        # Other publications merged into this article (story clustering, optional)
+        extra_sources = article_data.get("extra_sources") or []
+        if extra_sources:
+            fm_lines.append("extra_sources:")
+            for src in extra_sources:
+                fm_lines.append(f'  - name: "{src.get("name", "").replace(chr(34), chr(39))}"')
+                fm_lines.append(f'    url: "{src.get("url", "").replace(chr(34), chr(39))}"')
 
         # Social media hooks (optional, from Gemini)
         telegram_hook = article_data.get("telegram_hook", "")
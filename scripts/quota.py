@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+quota.py — Персистентний облік квот зовнішніх API між запусками.
+
+data/quota_ledger.json тримає token bucket на кожну пару (API, ключ) і кожен ліміт
+з config.QUOTA_LIMITS: хвилинні/годинні бакети поповнюються безперервно, денні
+("period": "day") обнуляються опівночі за Pacific, як квоти Google. Ключі в
+журнал не потрапляють — лише перші 10 символів їхнього sha256.
+
+Перед викликом API клієнт питає ledger, а не дізнається про ліміт з 429:
+  wait_time(api, key, cost)    — скільки чекати до появи ємності (0 — можна зараз)
+  available_at(api, key, cost) — коли саме (datetime UTC)
+  try_consume / consume        — списати cost (try — лише якщо є ємність)
+  acquire(api, key, cost, max_wait) — дочекатися (якщо не довше max_wait) і списати
+  exhaust(api, key, ...)       — провайдер відповів 429/quotaExceeded: синхронізувати
+
+Usage:
+  python scripts/quota.py      # стан усіх бакетів
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import (
+    GEMINI_MODEL_LIMITS, GEMINI_RPD_LIMIT, GEMINI_RPM_LIMIT, QUOTA_LEDGER_FILE, QUOTA_LIMITS,
+)
+from ratelimit import seconds_until_daily_reset
+from utils import load_json, save_json
+
+_lock = threading.Lock()
+
+
+def limits_for(api):
+    """Ліміти API: з QUOTA_LIMITS, для "gemini:<model>" — з лімітів моделі."""
+    if api in QUOTA_LIMITS:
+        return QUOTA_LIMITS[api]
+    if api.startswith("gemini:"):
+        limits = GEMINI_MODEL_LIMITS.get(api.split(":", 1)[1], {"rpm": GEMINI_RPM_LIMIT, "rpd": GEMINI_RPD_LIMIT})
+        return [{"capacity": limits["rpm"], "period": 60}, {"capacity": limits["rpd"], "period": "day"}]
+    return []
+
+
+def _key_id(key):
+    return hashlib.sha256(str(key).encode("utf-8")).hexdigest()[:10] if key else "-"
+
+
+def _day_stamp(now):
+    # Pacific date of `now`: the day a daily bucket belongs to
+    return datetime.fromtimestamp(now + seconds_until_daily_reset(), timezone.utc).strftime("%Y-%m-%d")
+
+
+def _refill(bucket, limit, now):
+    """Поповнює бакет (in place) на момент now і повертає його."""
+    if limit["period"] == "day":
+        today = _day_stamp(now)
+        if bucket.get("day") != today:
+            bucket.update(tokens=float(limit["capacity"]), day=today)
+    else:
+        rate = limit["capacity"] / limit["period"]
+        bucket["tokens"] = min(float(limit["capacity"]), bucket["tokens"] + (now - bucket["updated"]) * rate)
+    bucket["updated"] = now
+    return bucket
+
+
+def _bucket(buckets, api, key, limit, now):
+    name = f"{api}|{_key_id(key)}|{limit['period']}"
+    bucket = buckets.setdefault(name, {"tokens": float(limit["capacity"]), "updated": now})
+    return _refill(bucket, limit, now)
+
+
+def _wait(bucket, limit, cost, now):
+    missing = min(cost, limit["capacity"]) - bucket["tokens"]
+    if missing <= 0:
+        return 0.0
+    if limit["period"] == "day":
+        return seconds_until_daily_reset()
+    return missing * limit["period"] / limit["capacity"]
+
+
+def _update(api, key, fn):
+    """fn(pairs, now) над [(bucket, limit)] під локом; стан зберігається, якщо fn повернув (value, True)."""
+    with _lock:
+        ledger = load_json(QUOTA_LEDGER_FILE, {"buckets": {}})
+        buckets = ledger.setdefault("buckets", {})
+        now = time.time()
+        pairs = [(_bucket(buckets, api, key, limit, now), limit) for limit in limits_for(api)]
+        value, changed = fn(pairs, now)
+        if changed:
+            save_json(QUOTA_LEDGER_FILE, ledger)
+        return value
+
+
+def wait_time(api, key=None, cost=1):
+    """Секунди до моменту, коли cost одиниць буде доступно (0 — доступно зараз)."""
+    return _update(api, key, lambda pairs, now: (max([_wait(b, l, cost, now) for b, l in pairs] or [0.0]), False))
+
+
+def available_at(api, key=None, cost=1):
+    """Момент (UTC), коли cost одиниць буде доступно."""
+    return datetime.fromtimestamp(time.time() + wait_time(api, key, cost), timezone.utc)
+
+
+def consume(api, key=None, cost=1):
+    """Списує cost безумовно (бакет може піти в мінус — фактичне використання вже сталося)."""
+    def fn(pairs, now):
+        for bucket, _ in pairs:
+            bucket["tokens"] -= cost
+        return None, bool(pairs)
+    _update(api, key, fn)
+
+
+def try_consume(api, key=None, cost=1):
+    """Списує cost, якщо ємність є: повертає 0. Інакше нічого не списує і повертає очікування (сек)."""
+    def fn(pairs, now):
+        wait = max([_wait(b, l, cost, now) for b, l in pairs] or [0.0])
+        if wait > 0:
+            return wait, False
+        for bucket, _ in pairs:
+            bucket["tokens"] -= cost
+        return 0.0, bool(pairs)
+    return _update(api, key, fn)
+
+
+def acquire(api, key=None, cost=1, max_wait=60.0):
+    """Чекає на ємність (не довше max_wait) і списує cost. False — не дочекались."""
+    deadline = time.time() + max_wait
+    while True:
+        wait = try_consume(api, key, cost)
+        if wait <= 0:
+            return True
+        if time.time() + wait > deadline:
+            return False
+        time.sleep(min(wait, 5.0))
+
+
+def exhaust(api, key=None, retry_after=None, daily=False):
+    """Провайдер відмовив через ліміт: денні бакети (daily=True) обнуляються до скидання,
+    інакше бакети з періодом поповнюються не раніше ніж через retry_after секунд."""
+    def fn(pairs, now):
+        for bucket, limit in pairs:
+            if limit["period"] == "day":
+                if daily:
+                    bucket["tokens"] = 0.0
+            else:
+                delay = retry_after or limit["period"] / limit["capacity"]
+                bucket["tokens"] = min(bucket["tokens"], 1 - delay * limit["capacity"] / limit["period"])
+        return None, bool(pairs)
+    _update(api, key, fn)
+
+
+def _print_status():
+    ledger = load_json(QUOTA_LEDGER_FILE, {"buckets": {}})
+    if not ledger.get("buckets"):
+        print("[INFO] Quota ledger is empty")
+        return
+    print(f"{'api':<28} {'key':<11} {'period':>6} {'left':>8} {'capacity':>9}")
+    now = time.time()
+    for name in sorted(ledger["buckets"]):
+        api, key_id, period = name.split("|")
+        limit = next((l for l in limits_for(api) if str(l["period"]) == period), None)
+        if not limit:
+            continue
+        bucket = _refill(dict(ledger["buckets"][name]), limit, now)
+        print(f"{api:<28} {key_id:<11} {period:>6} {bucket['tokens']:>8.1f} {limit['capacity']:>9}")
+
+
+if __name__ == "__main__":
+    _print_status()
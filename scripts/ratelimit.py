@@ -0,0 +1,229 @@
+"""
+ratelimit.py — Rate-limit aware планувальник для паралельних LLM-запитів.
+
+RateLimiter тримає ковзне 60-секундне вікно запитів і токенів (RPM/TPM)
+та адаптивну межу одночасних запитів: кожна відповідь 429 зменшує межу вдвічі
+і ставить cooldown з експоненційним backoff, кожен успіх поступово повертає
+паралелізм назад (AIMD).
+
+CircuitBreaker — per-run запобіжник для моделей: після кількох поспіль
+невдач (429, timeout, битий JSON) модель пропускається на cooldown.
+
+KeyPool — пул API-ключів одного провайдера: окремий RateLimiter (RPM/RPD/TPM)
+на ключ, запит іде на найменш завантажений ключ, ключ з вичерпаною денною
+квотою пропускається до її скидання. З quota_api пул також звіряється з
+персистентним журналом квот (quota.py), тож денна квота пам'ятається між запусками.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")  # Gemini daily quotas reset at midnight Pacific
+except Exception:  # no tz database on the host
+    _QUOTA_TZ = None
+
+WINDOW_SECONDS = 60.0
+DAY_SECONDS = 86400.0
+
+
+def seconds_until_daily_reset():
+    """Секунди до скидання денної квоти (північ за Pacific time, або 1 год без tz-бази)."""
+    if _QUOTA_TZ is None:
+        return 3600.0
+    now = datetime.now(_QUOTA_TZ)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=_QUOTA_TZ)
+    return max(60.0, (midnight - now).total_seconds())
+
+
+class RateLimiter:
+    """Потокобезпечний limiter: RPM + TPM + RPD + адаптивний max in-flight."""
+
+    def __init__(self, name, rpm, tpm=0, max_concurrency=4, min_backoff=2.0, max_backoff=60.0, rpd=0,
+                 quota_key=None):
+        self.name = name
+        self.quota_key = quota_key  # (api, key) in the persistent quota ledger, if any
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpd = rpd
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._requests = deque()   # timestamps of started requests
+        self._tokens = deque()     # (timestamp, tokens)
+        self._day = deque()        # timestamps of requests in the last 24h (RPD)
+        self._in_flight = 0
+        self._limit = float(self.max_concurrency)
+        self._cooldown_until = 0.0
+        self._backoff = 0.0
+
+    def _prune(self, now):
+        while self._requests and now - self._requests[0] >= WINDOW_SECONDS:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= WINDOW_SECONDS:
+            self._tokens.popleft()
+        while self._day and now - self._day[0] >= DAY_SECONDS:
+            self._day.popleft()
+
+    def _wait_time(self, now, tokens):
+        """Скільки чекати до наступного дозволеного старту (0 — можна зараз)."""
+        waits = [self._cooldown_until - now]
+        if self._in_flight >= int(self._limit):
+            waits.append(0.5)
+        if self.rpm and len(self._requests) >= self.rpm:
+            waits.append(self._requests[0] + WINDOW_SECONDS - now)
+        if self.rpd and len(self._day) >= self.rpd:
+            waits.append(self._day[0] + DAY_SECONDS - now)
+        if self.tpm and tokens:
+            used = sum(t for _, t in self._tokens)
+            # Single request bigger than the budget may run once the window is empty
+            if used and used + tokens > self.tpm:
+                waits.append(self._tokens[0][0] + WINDOW_SECONDS - now)
+        return max(waits)
+
+    def acquire(self, tokens=0):
+        """Блокує до появи вільного слоту. Повертає час очікування (сек)."""
+        started = time.time()
+        with self._cond:
+            while True:
+                now = time.time()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    break
+                self._cond.wait(timeout=min(wait, 5.0))
+            self._take(now, tokens)
+        return time.time() - started
+
+    def try_acquire(self, tokens=0):
+        """Неблокуючий acquire: 0 — слот зайнято, інакше скільки чекати (сек)."""
+        with self._cond:
+            now = time.time()
+            self._prune(now)
+            wait = self._wait_time(now, tokens)
+            if wait > 0:
+                return wait
+            self._take(now, tokens)
+            return 0.0
+
+    def _take(self, now, tokens):
+        self._in_flight += 1
+        self._requests.append(now)
+        self._day.append(now)
+        if tokens:
+            self._tokens.append((now, tokens))
+
+    def load(self):
+        """Відносне завантаження (для вибору ключа): in-flight та частка RPM/RPD."""
+        with self._cond:
+            self._prune(time.time())
+            load = self._in_flight / max(1.0, self._limit)
+            if self.rpm:
+                load += len(self._requests) / self.rpm
+            if self.rpd:
+                load += len(self._day) / self.rpd
+            return load
+
+    def release(self, throttled=False, retry_after=None, daily_exhausted=False):
+        """Звільняє слот. throttled=True — провайдер відповів 429;
+        daily_exhausted=True — вичерпана денна квота (cooldown до її скидання)."""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if daily_exhausted:
+                reset_in = seconds_until_daily_reset()
+                self._cooldown_until = max(self._cooldown_until, time.time() + reset_in)
+                print(f"   [RATE] {self.name}: daily quota exhausted → skipped for {reset_in / 3600:.1f}h")
+                if self.quota_key:
+                    import quota
+                    quota.exhaust(*self.quota_key, daily=True)
+            elif throttled:
+                self._backoff = min(self.max_backoff, max(self.min_backoff, self._backoff * 2))
+                delay = max(self._backoff, retry_after or 0)
+                self._cooldown_until = max(self._cooldown_until, time.time() + delay)
+                self._limit = max(1.0, self._limit / 2)
+                print(f"   [RATE] {self.name}: 429 → concurrency {int(self._limit)}, cooldown {delay:.0f}s")
+            else:
+                self._backoff = 0.0
+                self._limit = min(float(self.max_concurrency), self._limit + 0.5)
+            self._cond.notify_all()
+
+
+
+class CircuitBreaker:
+    """Потокобезпечний circuit breaker по імені моделі/провайдера."""
+
+    def __init__(self, failure_threshold=2, cooldown_seconds=600.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._open_until = {}
+
+    def allows(self, name):
+        """False — модель у стані open (cooldown ще не минув)."""
+        with self._lock:
+            until = self._open_until.get(name, 0.0)
+            if until and time.time() >= until:
+                # Half-open: give it one more chance
+                self._open_until.pop(name, None)
+                self._failures[name] = self.failure_threshold - 1
+            return time.time() >= until
+
+    def record(self, name, success):
+        with self._lock:
+            if success:
+                self._failures[name] = 0
+                return
+            self._failures[name] = self._failures.get(name, 0) + 1
+            if self._failures[name] >= self.failure_threshold:
+                self._open_until[name] = time.time() + self.cooldown_seconds
+                print(f"   [CIRCUIT] {name}: {self._failures[name]} failures → skipped for {self.cooldown_seconds:.0f}s")
+
+
+class KeyPool:
+    """Пул ключів: RateLimiter на ключ, вибір найменш завантаженого доступного ключа."""
+
+    def __init__(self, name, keys, rpm, tpm=0, rpd=0, max_concurrency=4, quota_api=None):
+        self.name = name
+        self.keys = list(keys)
+        self.quota_api = quota_api
+        # Limiter names carry only the key's position: keys never reach the logs
+        self._limiters = {
+            key: RateLimiter(f"{name}#{i + 1}", rpm=rpm, tpm=tpm, rpd=rpd, max_concurrency=max_concurrency,
+                             quota_key=(quota_api, key) if quota_api else None)
+            for i, key in enumerate(self.keys)
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def acquire(self, tokens=0, max_wait=120.0):
+        """Блокує до вільного слоту на будь-якому ключі. Повертає (key, limiter),
+        або (None, None), якщо всі ключі недоступні довше за max_wait (напр. денна квота)."""
+        if self.quota_api:
+            import quota
+        deadline = time.time() + max_wait
+        while True:
+            waits = []
+            for key in sorted(self.keys, key=lambda k: self._limiters[k].load()):
+                # Quota left over from earlier runs (daily limits) is checked first
+                if self.quota_api:
+                    ledger_wait = quota.wait_time(self.quota_api, key)
+                    if ledger_wait > 0:
+                        waits.append(ledger_wait)
+                        continue
+                wait = self._limiters[key].try_acquire(tokens)
+                if wait <= 0:
+                    if self.quota_api:
+                        quota.consume(self.quota_api, key)
+                    return key, self._limiters[key]
+                waits.append(wait)
+            if time.time() + min(waits) > deadline:
+                print(f"   [RATE] {self.name}: all {len(self.keys)} keys unavailable for {min(waits):.0f}s")
+                return None, None
+            time.sleep(min(max(min(waits), 0.1), 5.0))
@@ -3,18 +3,57 @@ rewriter.py — Переписує новини українською.
 Primary: Gemini API (безкоштовний). Fallback: OpenRouter (безкоштовні моделі).
 """
 
+import hashlib
 import json
 import os
 import re
+import threading
 import time
 import urllib.request
 import urllib.error
-from config import GEMINI_SYSTEM_PROMPT
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from datetime import datetime, timezone
+from config import (
+    GEMINI_SYSTEM_PROMPT, REWRITE_MAX_CONCURRENCY,
+    GEMINI_RPM_LIMIT, GEMINI_TPM_LIMIT, GEMINI_RPD_LIMIT, OPENROUTER_RPM_LIMIT, gemini_api_keys,
+    GEMINI_MODEL_LIMITS, MODEL_PRICES_USD_PER_1M, REWRITE_ROUTES, REWRITE_ROUTE_SHORT_TOKENS, REWRITE_ROUTE_LONG_TOKENS,
+    REWRITE_ROUTE_SLOW_SECONDS,
+    REWRITE_CACHE_FILE, REWRITE_CACHE_TTL_HOURS,
+    REWRITE_CACHE_MAX_ENTRIES, REWRITE_CACHE_MAX_BYTES,
+    REWRITE_INPUT_TOKEN_BUDGET, REWRITE_MAX_OUTPUT_TOKENS, HEMP_KEYWORDS,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS,
+    REWRITE_HEDGE_ENABLED, REWRITE_HEDGE_PERCENTILE, REWRITE_HEDGE_DEFAULT_DELAY,
+    REWRITE_STREAM_ENABLED, GEMINI_CONTEXT_CACHE_ENABLED, GEMINI_CONTEXT_CACHE_MIN_JOBS,
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS, GEMINI_CONTEXT_CACHE_REFRESH_MARGIN,
+)
+import telemetry
+from ratelimit import CircuitBreaker, KeyPool, RateLimiter
+from utils import load_json, save_json
 
 
-# === Gemini API ===
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+# === Gemini API (keys: config.gemini_api_keys — GEMINI_API_KEY and/or GEMINI_API_KEYS pool) ===
+# GEMINI_API_BASE can point at a local stand-in of the API for offline testing
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent"
+GEMINI_BATCH_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:batchGenerateContent"
+GEMINI_CACHE_URL = f"{GEMINI_API_BASE}/cachedContents"
+
+# Per-article cost accounting (telemetry.cost_usd) counts unpriced models as $0
+_routed_models = {GEMINI_MODEL} | {route["model"] for route in REWRITE_ROUTES.values()}
+for _model in sorted(_routed_models - set(MODEL_PRICES_USD_PER_1M)):
+    print(f"[WARN] {_model} has no price in MODEL_PRICES_USD_PER_1M — its calls will cost $0 in telemetry")
+
+
+def _gemini_url(model, method):
+    """URL методу моделі (generateContent, streamGenerateContent) — для маршрутизації між моделями."""
+    return f"{GEMINI_API_BASE}/models/{model}:{method}"
+
+# Batch Mode polling
+BATCH_POLL_INTERVAL_SECONDS = 30
+BATCH_TIMEOUT_SECONDS = 3 * 3600
 
 # === OpenRouter API (fallback) ===
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
@@ -25,17 +64,332 @@ OPENROUTER_MODELS = [
     "z-ai/glm-4.5-air:free",
 ]
 
+# Shared per-provider limiters: all rewrite threads of a run go through them.
+# Gemini goes through a key pool (one limiter per key), see _gemini_pool()
+_LIMITERS = {
+    "openrouter": RateLimiter("OpenRouter", rpm=OPENROUTER_RPM_LIMIT,
+                              max_concurrency=REWRITE_MAX_CONCURRENCY),
+}
+_POOLS = {}
+_pool_lock = threading.Lock()
+
+_BREAKER = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS)
+
+# Gemini cachedContents handles for GEMINI_SYSTEM_PROMPT, per (API key, model):
+# a cache belongs to one project and one model
+_SYSTEM_CACHES = {}
+_system_cache_lock = threading.Lock()
+
+# Observed per-model latencies of successful calls in this run (for hedging)
+_LATENCIES = {}
+_latency_lock = threading.Lock()
+
+
+def _gemini_pool(model=GEMINI_MODEL):
+    """KeyPool моделі для поточного набору Gemini-ключів (None, якщо ключів немає).
+    Квоти рахуються окремо для кожної моделі."""
+    keys = tuple(gemini_api_keys())
+    if not keys:
+        return None
+    with _pool_lock:
+        if (model, keys) not in _POOLS:
+            limits = GEMINI_MODEL_LIMITS.get(
+                model, {"rpm": GEMINI_RPM_LIMIT, "tpm": GEMINI_TPM_LIMIT, "rpd": GEMINI_RPD_LIMIT}
+            )
+            name = "Gemini" if model == GEMINI_MODEL else model
+            _POOLS[(model, keys)] = KeyPool(name, keys, max_concurrency=REWRITE_MAX_CONCURRENCY,
+                                            quota_api=f"gemini:{model}", **limits)
+            if len(keys) > 1 and model == GEMINI_MODEL:
+                print(f"[INFO] Gemini key pool: {len(keys)} keys")
+        return _POOLS[(model, keys)]
+
+
+def estimate_tokens(text):
+    """Оцінка кількості токенів: ~4 символи/токен для латиниці, ~2.7 для кирилиці та іншого."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return int(ascii_chars / 4 + (len(text) - ascii_chars) / 2.7) + 1
+
+
+# ---------------------------------------------------------------------------
+# Token budgeting: paragraph-aware trimming of the article body
+# ---------------------------------------------------------------------------
+
+_MAX_PARAGRAPH_CHARS = 600
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+(?=[A-ZА-ЯІЇЄҐ0-9\"«])")
 
-def rewrite_article(title, summary, source_url, content="", source_images=None, force_relevant=False):
+
+def _split_paragraphs(text):
+    """Абзаци за \\n\\n; задовгі абзаци (і текст без розривів — scraper зливає пробіли)
+    діляться на блоки по 3 речення."""
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= _MAX_PARAGRAPH_CHARS:
+            blocks.append(paragraph)
+            continue
+        sentences = [s for s in _SENTENCE_SPLIT.split(paragraph) if s]
+        blocks.extend(" ".join(sentences[i:i + 3]) for i in range(0, len(sentences), 3))
+    return blocks
+
+
+def _paragraph_score(paragraph, seen_words):
+    """Інформативність абзацу: цифри, власні назви, hemp-терміни, нові слова; мінус boilerplate."""
+    from scraper import _BOILERPLATE
+
+    words = re.findall(r"\w+", paragraph.lower())
+    if not words:
+        return 0.0
+    new_words = {w for w in words if len(w) > 3} - seen_words
+    score = len(new_words) / len(words)
+    score += 0.15 * min(len(re.findall(r"\d+(?:[.,]\d+)?%?", paragraph)), 5)
+    score += 0.05 * min(len(re.findall(r"(?<!^)(?<![.!?]\s)\b[A-ZА-ЯІЇЄҐ][\w-]+", paragraph)), 6)
+    score += 0.2 * sum(1 for kw in HEMP_KEYWORDS if kw in paragraph.lower())
+    if _BOILERPLATE.search(paragraph):
+        score -= 1.0
+    if len(words) < 6:
+        score -= 0.3
+    return score
+
+
+def trim_to_budget(text, max_tokens, keep_last=False):
+    """
+    Скорочує текст до max_tokens, залишаючи найінформативніші абзаци в початковому порядку.
+    Перший абзац (лід) зберігається завжди; keep_last=True — також останній
+    (для відео там інструкція для моделі).
+    """
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    paragraphs = _split_paragraphs(text)
+    if len(paragraphs) <= 1:
+        # Single block: hard cut at the estimated char budget
+        return text[:max(200, int(len(text) * max_tokens / estimate_tokens(text)))]
+
+    pinned = {0, len(paragraphs) - 1} if keep_last else {0}
+    seen_words = set()
+    scored = []
+    for i, paragraph in enumerate(paragraphs):
+        score = _paragraph_score(paragraph, seen_words)
+        seen_words.update(w for w in re.findall(r"\w+", paragraph.lower()) if len(w) > 3)
+        scored.append((score, i))
+
+    chosen = set(pinned)
+    used = sum(estimate_tokens(paragraphs[i]) for i in chosen)
+    for score, i in sorted(scored, reverse=True):
+        if i in chosen or score <= 0:
+            continue
+        cost = estimate_tokens(paragraphs[i])
+        if used + cost > max_tokens:
+            continue
+        chosen.add(i)
+        used += cost
+
+    return "\n\n".join(paragraphs[i] for i in sorted(chosen))
+
+
+def _max_output_tokens(input_tokens, content_type):
+    """Ліміт самої відповіді: переклад ≈ 90–110% оригіналу + JSON-поля, в межах ліміту типу.
+    На моделях 2.5 thinking рахується всередині maxOutputTokens — бюджет thinking
+    задається явно і додається до цього ліміту викликачем."""
+    cap = REWRITE_MAX_OUTPUT_TOKENS.get(content_type, 8192)
+    return max(2048, min(cap, int(input_tokens * 2) + 1536))
+
+
+def _usage_from_response(result):
+    """Фактичні токени з usageMetadata (Gemini) або usage (OpenRouter)."""
+    meta = result.get("usageMetadata")
+    if meta:
+        return {
+            "input_tokens": meta.get("promptTokenCount", 0),
+            "output_tokens": meta.get("candidatesTokenCount", 0),
+            "thinking_tokens": meta.get("thoughtsTokenCount", 0),
+            "cached_tokens": meta.get("cachedContentTokenCount", 0),
+            "total_tokens": meta.get("totalTokenCount", 0),
+        }
+    usage = result.get("usage") or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "thinking_tokens": 0,
+        "cached_tokens": 0,
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+def _attach_usage(parsed, result, label, estimated_input):
+    """Додає фактичні токени до результату (_usage) і друкує їх."""
+    usage = _usage_from_response(result)
+    usage["model"] = label
+    usage["estimated_input_tokens"] = estimated_input
+    print(f"   📊 Tokens ({label}): in {usage['input_tokens']} (est. {estimated_input}), "
+          f"out {usage['output_tokens']}, thinking {usage['thinking_tokens']}")
+    if parsed:
+        parsed["_usage"] = usage
+    return parsed
+
+
+def rewrite_many(jobs, max_workers=None):
+    """
+    Паралельний рерайт кількох статей через спільні rate limiters.
+    jobs: список kwargs-dict для rewrite_article.
+    Повертає список результатів у тому ж порядку, що й jobs (None при помилці).
+    """
+    if not jobs:
+        return []
+    pool = _gemini_pool()
+    # Every extra key adds its own RPM/concurrency budget
+    default_workers = REWRITE_MAX_CONCURRENCY * max(1, len(pool) if pool else 1)
+    workers = max(1, min(max_workers or default_workers, len(jobs)))
+
+    # Several articles share one long system prompt: pay for it once via context cache
+    # (per model, for the models that enough of these articles are routed to)
+    if pool:
+        planned = {}
+        for job in jobs:
+            model = _route(_rough_prompt_tokens(job), _job_content_type(job), quiet=True)["model"]
+            planned[model] = planned.get(model, 0) + 1
+        for model, count in planned.items():
+            if count >= GEMINI_CONTEXT_CACHE_MIN_JOBS:
+                for key in pool.keys:
+                    _system_cache_handle(key, model, create=True)
+
+    def _run(job):
+        try:
+            return rewrite_article(**job)
+        except Exception as e:
+            print(f"   Rewrite error: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run, jobs))
+
+
+def rewrite_article(title, summary, source_url, content="", source_images=None, force_relevant=False,
+                    content_type=None):
     """
     Рерайтить статтю українською. Спочатку Gemini, потім OpenRouter.
-    Повертає dict або None.
+    Повертає dict або None. Фактичні токени виклику — у result["_usage"].
     force_relevant=True — для вручну доданих URL, не перевіряти релевантність.
+    content_type: "news" | "video" | "manual" | "cluster" — визначає бюджет токенів
+    ("cluster" — content зібраний build_cluster_content з кількох джерел;
+    за замовчуванням "manual" при force_relevant, інакше "news").
     """
+    content_type = _job_content_type({"content_type": content_type, "force_relevant": force_relevant})
+    user_prompt = _build_user_prompt(title, summary, source_url, content, content_type)
+
+    cache_key = _rewrite_cache_key(user_prompt, force_relevant)
+    cached = _get_cached_rewrite(cache_key)
+    if cached is not None:
+        print("   [CACHE HIT] rewrite result reused")
+        return cached
+
+    if force_relevant:
+        user_prompt += _FORCE_RELEVANT_NOTE
+
+    result = _rewrite_uncached(user_prompt, _route(estimate_tokens(user_prompt), content_type))
+    if result:
+        _set_cached_rewrite(cache_key, result)
+    return result
+
+
+def _job_content_type(job):
+    return job.get("content_type") or ("manual" if job.get("force_relevant") else "news")
+
+
+def _rough_prompt_tokens(job):
+    """Оцінка токенів промпту без побудови (тіло обмежене бюджетом типу контенту)."""
+    body = job.get("content") or job.get("summary", "")
+    budget = REWRITE_INPUT_TOKEN_BUDGET.get(_job_content_type(job), REWRITE_INPUT_TOKEN_BUDGET["news"])
+    return min(estimate_tokens(body), budget) + estimate_tokens(job.get("title", "")) + 30
+
+
+def _route(input_tokens, content_type, quiet=False):
+    """
+    Маршрут рерайту за розміром входу, типом контенту та латентністю цього запуску:
+    {"tier", "model", "thinking_budget", "max_output_tokens"}.
+    """
+    if content_type in ("manual", "cluster") or input_tokens > REWRITE_ROUTE_LONG_TOKENS:
+        tier = "long"
+    elif content_type == "video" or input_tokens < REWRITE_ROUTE_SHORT_TOKENS:
+        tier = "short"
+    else:
+        tier = "standard"
+
+    # A run where flash is slow shifts typical news to the lighter model
+    if tier == "standard":
+        slow = _median_latency(REWRITE_ROUTES["standard"]["model"])
+        light = _median_latency(REWRITE_ROUTES["short"]["model"])
+        if slow is not None and slow > REWRITE_ROUTE_SLOW_SECONDS and (light is None or light < slow):
+            tier = "short"
+            if not quiet:
+                print(f"   🧭 {REWRITE_ROUTES['standard']['model']} median {slow:.0f}s — routing to short tier")
+
+    route = dict(REWRITE_ROUTES[tier], tier=tier)
+    answer = _max_output_tokens(input_tokens, content_type)
+    if tier != "long":
+        answer = min(answer, route["max_output_tokens"])
+    # Thinking tokens are counted inside maxOutputTokens on 2.5 models
+    route["max_output_tokens"] = answer + route["thinking_budget"]
+    if not quiet:
+        print(f"   🧭 Route: {tier} → {route['model']} (~{input_tokens} tok in, {content_type}, "
+              f"max out {route['max_output_tokens']})")
+    return route
+
+
+def _median_latency(name):
+    with _latency_lock:
+        samples = sorted(_LATENCIES.get(name, ()))
+    if len(samples) < 3:
+        return None
+    return samples[len(samples) // 2]
+
+
+def build_cluster_content(sources):
+    """
+    Текст кількох публікацій однієї події для content_type="cluster".
+    sources: [{"title", "source", "link", "content"}]; кожне джерело обрізається
+    до своєї частки бюджету, щоб жодне не витіснило інші.
+    """
+    share = REWRITE_INPUT_TOKEN_BUDGET["cluster"] // max(1, len(sources))
+    blocks = []
+    for n, src in enumerate(sources, 1):
+        body = trim_to_budget(src.get("content") or "", share)
+        blocks.append(f"--- Джерело {n} ({src.get('source', '')}, {src.get('link', '')}) ---\n"
+                      f"{src.get('title', '')}\n\n{body}")
+    return "\n\n".join(blocks)
+
+
+_FORCE_RELEVANT_NOTE = "\n\nВАЖЛИВО: Цю статтю додано вручну редактором. НЕ відхиляй її як нерелевантну — обов'язково переклади та оформи. Не повертай {\"rejected\": true}."
+
+
+def _build_user_prompt(title, summary, source_url, content="", content_type="news"):
+    """Формує user-частину промпту (без системних інструкцій), тіло — в межах бюджету токенів."""
     # Use full content if available, otherwise summary
     article_body = content if content and len(content) > len(summary) else summary
 
-    user_prompt = f"""Перепиши цю новину:
+    budget = REWRITE_INPUT_TOKEN_BUDGET.get(content_type, REWRITE_INPUT_TOKEN_BUDGET["news"])
+    trimmed = trim_to_budget(article_body, budget, keep_last=(content_type == "video"))
+    if len(trimmed) < len(article_body):
+        print(f"   ✂️ Trimmed input {len(article_body)} → {len(trimmed)} chars "
+              f"(budget {budget} tokens, {content_type})")
+    article_body = trimmed
+
+    if content_type == "cluster":
+        return f"""Перепиши цю новину на основі кількох публікацій про одну подію.
+Об'єднай факти з усіх джерел в одну статтю, не повторюй однакові факти двічі;
+якщо джерела розходяться в цифрах чи деталях — вкажи, хто що повідомляє.
+
+Заголовок: {title}
+
+Публікації:
+{article_body}
+
+Основне джерело: {source_url}"""
+
+    return f"""Перепиши цю новину:
 
 Заголовок: {title}
 
@@ -43,48 +397,257 @@ def rewrite_article(title, summary, source_url, content="", source_images=None,
 
 Джерело: {source_url}"""
 
-    if force_relevant:
-        user_prompt += "\n\nВАЖЛИВО: Цю статтю додано вручну редактором. НЕ відхиляй її як нерелевантну — обов'язково переклади та оформи. Не повертай {\"rejected\": true}."
 
-    # Try Gemini first
-    gemini_key = os.environ.get("GEMINI_API_KEY", GEMINI_API_KEY)
-    if gemini_key:
-        result = _try_gemini(gemini_key, user_prompt)
-        if result:
-            return result
+def _rewrite_uncached(user_prompt, route):
+    """Модель маршруту, потім основна Gemini, потім OpenRouter (моделі з відкритим
+    circuit breaker пропускаються). REWRITE_HEDGE=1 — hedged-режим. Повертає dict або None."""
+    chain = _provider_chain(route)
+    if not chain:
+        print("[ERROR] No rewrite providers available (keys missing or all circuits open)")
+        return None
+
+    if REWRITE_HEDGE_ENABLED and len(chain) > 1:
+        result = _run_hedged(chain, user_prompt)
+    else:
+        result = None
+        for name, call in chain:
+            result = _call_provider(name, call, user_prompt)
+            if result is not None:
+                break
+
+    if result is None:
+        print("[ERROR] All rewrite methods failed")
+    return result
+
+
+def _provider_chain(route):
+    """Упорядкований список (ім'я моделі, callable) з урахуванням ключів та circuit breaker."""
+    chain = []
+    max_output_tokens = route["max_output_tokens"]
+    if _gemini_pool():
+        chain.append((route["model"], partial(
+            _try_gemini, model=route["model"], max_output_tokens=max_output_tokens,
+            thinking_budget=route["thinking_budget"],
+        )))
+        if route["model"] != GEMINI_MODEL:
+            # Routed to a lighter model: the default model is the first fallback, with the
+            # standard tier's thinking budget added to this route's answer cap
+            answer_tokens = max_output_tokens - route["thinking_budget"]
+            thinking = REWRITE_ROUTES["standard"]["thinking_budget"]
+            chain.append((GEMINI_MODEL, partial(
+                _try_gemini, max_output_tokens=answer_tokens + thinking, thinking_budget=thinking,
+            )))
 
-    # Fallback to OpenRouter
     openrouter_key = os.environ.get("OPENROUTER_API_KEY", OPENROUTER_API_KEY)
     if openrouter_key:
         for model in OPENROUTER_MODELS:
-            result = _try_openrouter(openrouter_key, model, user_prompt)
-            if result is not None:
-                return result
+            chain.append((model, partial(_try_openrouter, openrouter_key, model, max_output_tokens=max_output_tokens)))
+
+    allowed = []
+    for name, call in chain:
+        if _BREAKER.allows(name):
+            allowed.append((name, call))
+        else:
+            print(f"   ⏭️ {name}: circuit open, skipping")
+    return allowed
+
+
+def _call_provider(name, call, user_prompt):
+    """Виклик однієї моделі з обліком латентності та circuit breaker."""
+    started = time.time()
+    result = call(user_prompt)
+    if result is not None:
+        with _latency_lock:
+            _LATENCIES.setdefault(name, deque(maxlen=50)).append(time.time() - started)
+    _BREAKER.record(name, result is not None)
+    return result
+
+
+def _hedge_delay(name):
+    """Поріг hedging: перцентиль латентності моделі у цьому запуску (або default)."""
+    with _latency_lock:
+        samples = sorted(_LATENCIES.get(name, ()))
+    if len(samples) < 3:
+        return REWRITE_HEDGE_DEFAULT_DELAY
+    return samples[min(len(samples) - 1, int(len(samples) * REWRITE_HEDGE_PERCENTILE))]
+
+
+def _run_hedged(chain, user_prompt):
+    """Запускає наступного провайдера, якщо поточний повільніший за перцентиль
+    або впав; повертає перший валідний результат."""
+    executor = ThreadPoolExecutor(max_workers=len(chain))
+    futures = {}
+    next_idx = 0
+
+    def launch():
+        nonlocal next_idx
+        name, call = chain[next_idx]
+        next_idx += 1
+        futures[executor.submit(_call_provider, name, call, user_prompt)] = name
+
+    try:
+        launch()
+        while futures:
+            delay = _hedge_delay(chain[next_idx - 1][0]) if next_idx < len(chain) else None
+            done, _ = wait(list(futures), timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                print(f"   ⏱️ {chain[next_idx - 1][0]} slower than {delay:.0f}s — hedging with {chain[next_idx][0]}")
+                launch()
+                continue
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"   [WARN] {name} raised: {e}")
+                    result = None
+                if result is not None:
+                    if futures:
+                        print(f"   🏁 {name} won the hedge")
+                    return result
+                if next_idx < len(chain):
+                    launch()
+        return None
+    finally:
+        # Losers keep running in the background; their results are discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------------------------------------------------------------
+# Rewrite result cache (data/rewrite_cache.json)
+# ---------------------------------------------------------------------------
+
+_PROMPT_VERSION = hashlib.sha256(GEMINI_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+_cache_lock = threading.Lock()
+
+
+def _rewrite_cache_key(user_prompt, force_relevant):
+    """Ключ: нормалізований вхідний текст + force_relevant + хеш системного промпту."""
+    normalized = re.sub(r"\s+", " ", user_prompt).strip().lower()
+    raw = f"{_PROMPT_VERSION}|{int(bool(force_relevant))}|{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _get_cached_rewrite(cache_key):
+    """Повертає кешований результат або None якщо кеш відсутній/expired."""
+    with _cache_lock:
+        cache = load_json(REWRITE_CACHE_FILE, {"entries": {}})
+    entry = cache.get("entries", {}).get(cache_key)
+    if not entry:
+        return None
+
+    try:
+        cached_at = datetime.fromisoformat(entry["cached_at"])
+        age_hours = (datetime.now(timezone.utc) - cached_at).total_seconds() / 3600
+        if age_hours < REWRITE_CACHE_TTL_HOURS:
+            return dict(entry["result"])
+    except (KeyError, ValueError, TypeError):
+        pass
 
-    print("[ERROR] All rewrite methods failed")
     return None
 
 
-def _api_request_with_retry(url, payload, headers, label, max_attempts=2):
-    """Загальний HTTP POST з retry. Повертає розпарсений JSON або None."""
-    data = json.dumps(payload).encode("utf-8")
+def _set_cached_rewrite(cache_key, result):
+    """Кешує розпарсений результат (успіх або rejected) з TTL та size-based eviction."""
+    with _cache_lock:
+        cache = load_json(REWRITE_CACHE_FILE, {"entries": {}})
+        entries = cache.setdefault("entries", {})
+        now = datetime.now(timezone.utc)
+
+        entries[cache_key] = {
+            "result": {k: v for k, v in result.items() if k != "_usage"},
+            "prompt_version": _PROMPT_VERSION,
+            "cached_at": now.isoformat(),
+        }
+
+        # Прибрати expired записи та записи старої версії промпту
+        for key in list(entries):
+            try:
+                cached_at = datetime.fromisoformat(entries[key]["cached_at"])
+                expired = (now - cached_at).total_seconds() / 3600 >= REWRITE_CACHE_TTL_HOURS
+            except (KeyError, ValueError, TypeError):
+                expired = True
+            if expired or entries[key].get("prompt_version") != _PROMPT_VERSION:
+                del entries[key]
+
+        # Найстаріші — геть, поки не вкладемось у ліміти кількості та розміру
+        by_age = sorted(entries, key=lambda k: entries[k].get("cached_at", ""))
+        total_bytes = sum(len(json.dumps(e, ensure_ascii=False)) for e in entries.values())
+        while by_age and (len(entries) > REWRITE_CACHE_MAX_ENTRIES or total_bytes > REWRITE_CACHE_MAX_BYTES):
+            oldest = by_age.pop(0)
+            total_bytes -= len(json.dumps(entries.pop(oldest), ensure_ascii=False))
+
+        try:
+            save_json(REWRITE_CACHE_FILE, cache)
+        except OSError as e:
+            print(f"   [WARN] Rewrite cache write failed: {e}")
+
+
+def _api_request_with_retry(url, payload, headers, label, max_attempts=2, limiter=None,
+                            stream_handler=None, method="POST", call_info=None, key_pool=None,
+                            tokens=None):
+    """Загальний HTTP POST з retry. Повертає розпарсений JSON або None.
+
+    limiter: RateLimiter провайдера — чекає на слот перед кожною спробою,
+    а 429 передає йому для адаптивного backoff замість фіксованого sleep.
+    stream_handler(resp, sent_at): для SSE-відповідей читає потік замість json.loads.
+    call_info: dict, куди записуються attempts, http_status, error_body та queued (сек у limiter) для телеметрії.
+    key_pool: KeyPool — кожна спроба йде з найменш завантаженим ключем (?key=... додається до url),
+    payload тоді може бути callable(key) -> dict (напр. cachedContent, прив'язаний до ключа).
+    tokens: оцінка токенів запиту для TPM (за замовчуванням — з payload).
+    """
+    if tokens is None:
+        tokens = estimate_tokens(json.dumps(payload)) if not callable(payload) else 0
+    info = call_info if call_info is not None else {}
+    info.update({"attempts": 0, "http_status": None, "error_body": "", "queued": 0.0})
 
     for attempt in range(max_attempts):
+        info["attempts"] = attempt + 1
+        request_url = url
+        api_key = None
+        if key_pool:
+            acquired_at = time.time()
+            api_key, limiter = key_pool.acquire(tokens)
+            info["queued"] += time.time() - acquired_at
+            if api_key is None:
+                return None
+            info["key"] = api_key
+            request_url = f"{url}{'&' if '?' in url else '?'}key={api_key}"
+        elif limiter:
+            info["queued"] += limiter.acquire(tokens)
+        body = payload(api_key) if callable(payload) else payload
+        data = json.dumps(body).encode("utf-8")
+        throttled = False
+        daily_exhausted = False
+        retry_after = None
         try:
             req = urllib.request.Request(
-                url, data=data, headers=headers, method="POST"
+                request_url, data=data, headers=headers, method=method
             )
+            sent_at = time.time()
             with urllib.request.urlopen(req, timeout=60) as resp:
+                info["http_status"] = resp.status
+                if stream_handler:
+                    return stream_handler(resp, sent_at)
                 return json.loads(resp.read().decode("utf-8"))
 
         except urllib.error.HTTPError as e:
+            info["http_status"] = e.code
             try:
                 error_body = e.read().decode("utf-8")
             except Exception:
                 error_body = ""
+            info["error_body"] = error_body[:1000]
             print(f"   [WARN] {label} error (attempt {attempt+1}): {e.code} {error_body[:150]}")
             if e.code == 429:
-                time.sleep(5)
+                throttled = True
+                daily_exhausted = "PerDay" in error_body  # quotaId like GenerateRequestsPerDayPerProject...
+                try:
+                    retry_after = float(e.headers.get("Retry-After", "") or 0)
+                except (TypeError, ValueError):
+                    retry_after = None
+                if not limiter:
+                    time.sleep(5)
                 continue
             else:
                 return None
@@ -94,39 +657,177 @@ def _api_request_with_retry(url, payload, headers, label, max_attempts=2):
             if attempt < max_attempts - 1:
                 time.sleep(3)
 
+        finally:
+            if limiter:
+                limiter.release(throttled=throttled, retry_after=retry_after, daily_exhausted=daily_exhausted)
+
     return None
 
 
-def _try_gemini(api_key, user_prompt):
-    """Пробує Gemini API напряму."""
-    print("   🤖 Trying: Gemini 2.5 Flash")
+def _try_gemini(user_prompt, max_output_tokens=8192, model=GEMINI_MODEL, thinking_budget=None):
+    """Пробує Gemini API напряму (ключ — найменш завантажений з пулу моделі).
+    thinking_budget: None/-1 — динамічний (за замовчуванням моделі), 0 — без thinking."""
+    print(f"   🤖 Trying: {model}")
 
-    url = f"{GEMINI_API_URL}?key={api_key}"
-    payload = {
-        "contents": [{
-            "parts": [{"text": GEMINI_SYSTEM_PROMPT + "\n\n" + user_prompt}]
-        }],
-        "generationConfig": {
-            "temperature": 0.4,
-            "maxOutputTokens": 8192
-        }
-    }
+    pool = _gemini_pool(model)
+    started = time.time()
+    info = {}
+
+    def payload_for_key(api_key):
+        info["cached_content"] = _system_cache_handle(api_key, model)
+        return _gemini_payload(user_prompt, max_output_tokens, info["cached_content"], thinking_budget)
+
+    request_kwargs = dict(
+        headers={"Content-Type": "application/json"}, key_pool=pool, call_info=info,
+        max_attempts=max(2, len(pool)), tokens=estimate_tokens(GEMINI_SYSTEM_PROMPT + user_prompt),
+    )
+
+    if REWRITE_STREAM_ENABLED:
+        streamed = _api_request_with_retry(
+            f"{_gemini_url(model, 'streamGenerateContent')}?alt=sse", payload_for_key, label="Gemini stream",
+            stream_handler=partial(_consume_sse, extract_text=_gemini_chunk_text), **request_kwargs,
+        )
+        if streamed is None and _cache_handle_rejected(info):
+            _invalidate_system_cache(info["key"], model, info["cached_content"])
+        parsed = _parse_streamed(streamed, model, _gemini_input_estimate(user_prompt, info))
+        _record_call(model, started, info, parsed, streamed)
+        return parsed
 
     result = _api_request_with_retry(
-        url, payload, {"Content-Type": "application/json"}, "Gemini"
+        _gemini_url(model, "generateContent"), payload_for_key, label="Gemini", **request_kwargs
     )
     if not result:
+        if _cache_handle_rejected(info):
+            _invalidate_system_cache(info["key"], model, info["cached_content"])
+        _record_call(model, started, info, None)
         return None
 
     try:
         text = result["candidates"][0]["content"]["parts"][0]["text"]
-        return _parse_json_response(text)
+        parsed = _parse_json_response(text, _finish_reason(result))
     except (KeyError, IndexError) as e:
         print(f"   [WARN] Gemini response parse error: {e}")
+        parsed = None
+    parsed = _attach_usage(parsed, result, model, _gemini_input_estimate(user_prompt, info))
+    _record_call(model, started, info, parsed, result)
+    return parsed
+
+
+def _gemini_input_estimate(user_prompt, info):
+    """Оцінка вхідних токенів, надісланих у запиті (системний промпт — лише без context cache)."""
+    if info.get("cached_content"):
+        return estimate_tokens(user_prompt)
+    return estimate_tokens(GEMINI_SYSTEM_PROMPT + "\n\n" + user_prompt)
+
+
+def _gemini_payload(user_prompt, max_output_tokens=8192, cached_content=None, thinking_budget=None):
+    """GenerateContentRequest для рерайту (спільний для інтерактивного та batch режимів).
+    cached_content — ім'я cachedContents з системним промптом; тоді він не дублюється в запиті."""
+    payload = {
+        "contents": [{
+            "role": "user",
+            "parts": [{"text": user_prompt if cached_content else GEMINI_SYSTEM_PROMPT + "\n\n" + user_prompt}]
+        }],
+        "generationConfig": {
+            "temperature": 0.4,
+            "maxOutputTokens": max_output_tokens,
+            "responseMimeType": "application/json",
+            "responseSchema": REWRITE_RESPONSE_SCHEMA,
+        }
+    }
+    if cached_content:
+        payload["cachedContent"] = cached_content
+    if thinking_budget is not None and thinking_budget >= 0:
+        payload["generationConfig"]["thinkingConfig"] = {"thinkingBudget": thinking_budget}
+    return payload
+
+
+# ---------------------------------------------------------------------------
+# Context caching of the shared system prompt (Gemini cachedContents)
+# ---------------------------------------------------------------------------
+
+
+def _system_cache_handle(api_key, model=GEMINI_MODEL, create=False):
+    """
+    Ім'я cachedContents з GEMINI_SYSTEM_PROMPT або None (тоді промпт іде inline).
+    create=True — створити, якщо ще немає (rewrite_many на кількох статтях).
+    Хендл, якому лишилось менше REFRESH_MARGIN, продовжується на TTL. Поки інший
+    потік створює чи продовжує хендл, запит іде з поточним хендлом або inline.
+    """
+    if not GEMINI_CONTEXT_CACHE_ENABLED or not api_key:
         return None
+    with _system_cache_lock:
+        entry = _SYSTEM_CACHES.setdefault(
+            (api_key, model), {"name": "", "expires_at": 0.0, "disabled": False, "busy": False})
+        if entry["disabled"]:
+            return None
+        name = entry["name"]
+        refresh = bool(name) and entry["expires_at"] - time.time() <= GEMINI_CONTEXT_CACHE_REFRESH_MARGIN
+        if entry["busy"] or not (refresh or (not name and create)):
+            # Another thread is extending/creating it: the current handle (still valid) or inline meanwhile
+            return name or None
+        entry["busy"] = True
+
+    # HTTP calls outside the lock: concurrent rewrites never wait behind a round-trip
+    update = {}
+    try:
+        if refresh:
+            refreshed = _api_request_with_retry(
+                f"{GEMINI_API_BASE}/{name}?updateMask=ttl&key={api_key}",
+                {"ttl": f"{GEMINI_CONTEXT_CACHE_TTL_SECONDS}s"},
+                {"Content-Type": "application/json"}, "Gemini cache refresh",
+                max_attempts=1, method="PATCH",
+            )
+            if refreshed:
+                update["expires_at"] = time.time() + GEMINI_CONTEXT_CACHE_TTL_SECONDS
+                print(f"   🗄️ System prompt cache extended: {name}")
+            else:
+                update["name"] = name = ""
 
+        if not name and create:
+            created = _api_request_with_retry(
+                f"{GEMINI_CACHE_URL}?key={api_key}",
+                {
+                    "model": f"models/{model}",
+                    "displayName": "konopla-rewrite-system-prompt",
+                    "systemInstruction": {"parts": [{"text": GEMINI_SYSTEM_PROMPT}]},
+                    "ttl": f"{GEMINI_CONTEXT_CACHE_TTL_SECONDS}s",
+                },
+                {"Content-Type": "application/json"}, "Gemini cache create",
+                max_attempts=1,
+            )
+            if created and created.get("name"):
+                name = created["name"]
+                update.update(name=name, expires_at=time.time() + GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+                print(f"   🗄️ System prompt cached: {name} (TTL {GEMINI_CONTEXT_CACHE_TTL_SECONDS}s)")
+            else:
+                # Unsupported for this key/tier or prompt below the minimum size: inline for this run
+                update["disabled"] = True
+                print("   [INFO] Context caching unavailable — system prompt sent inline")
+    finally:
+        with _system_cache_lock:
+            entry.update(update, busy=False)
+    return name or None
 
-def _try_openrouter(api_key, model, user_prompt):
+
+def _cache_handle_rejected(info):
+    """True, якщо запит з cachedContent впав саме через хендл (400/404 про cached content),
+    а не через 429 чи мережу — тоді хендл ще дійсний і лишається."""
+    if not info.get("cached_content") or info.get("http_status") not in (400, 404):
+        return False
+    body = info.get("error_body", "").lower()
+    return "cachedcontent" in body or "cached content" in body
+
+
+def _invalidate_system_cache(api_key, model, name):
+    """Хендл відхилено API (зник або прострочений) — наступні запити йдуть без нього."""
+    with _system_cache_lock:
+        entry = _SYSTEM_CACHES.get((api_key, model))
+        if entry and entry["name"] == name:
+            entry["name"] = ""
+
+
+def _try_openrouter(api_key, model, user_prompt, max_output_tokens=8192):
     """Пробує одну модель через OpenRouter."""
     print(f"   🤖 Model: {model}")
 
@@ -137,39 +838,447 @@ def _try_openrouter(api_key, model, user_prompt):
             {"role": "user", "content": user_prompt}
         ],
         "temperature": 0.4,
-        "max_tokens": 8192,
+        "max_tokens": max_output_tokens,
+        # JSON mode; providers without support ignore it (require_parameters is off)
+        "response_format": {"type": "json_object"},
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": "https://konopla.ua",
+        "X-Title": "KONOPLA.UA"
     }
+    estimated_input = estimate_tokens(GEMINI_SYSTEM_PROMPT + user_prompt)
+    started = time.time()
+    info = {}
+
+    if REWRITE_STREAM_ENABLED:
+        payload["stream"] = True
+        payload["usage"] = {"include": True}  # usage arrives in the last SSE chunk
+        streamed = _api_request_with_retry(
+            OPENROUTER_URL, payload, headers, model,
+            limiter=_LIMITERS["openrouter"],
+            stream_handler=partial(_consume_sse, extract_text=_openrouter_chunk_text),
+            call_info=info,
+        )
+        parsed = _parse_streamed(streamed, model, estimated_input)
+        _record_call(model, started, info, parsed, streamed)
+        return parsed
 
     result = _api_request_with_retry(
-        OPENROUTER_URL, payload,
-        {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "HTTP-Referer": "https://konopla.ua",
-            "X-Title": "KONOPLA.UA"
-        },
-        model
+        OPENROUTER_URL, payload, headers, model,
+        limiter=_LIMITERS["openrouter"], call_info=info,
     )
     if not result:
+        _record_call(model, started, info, None)
         return None
 
     try:
         text = result["choices"][0]["message"]["content"]
-        return _parse_json_response(text)
+        parsed = _parse_json_response(text, _finish_reason(result))
     except (KeyError, IndexError) as e:
         print(f"   [WARN] {model} response parse error: {e}")
+        parsed = None
+    parsed = _attach_usage(parsed, result, model, estimated_input)
+    _record_call(model, started, info, parsed, result)
+    return parsed
+
+
+def _record_call(model, started, info, parsed, response=None, kind="rewrite"):
+    """Телеметрія одного виклику моделі. response — сира відповідь API або результат _consume_sse."""
+    if parsed is not None:
+        outcome = "rejected" if parsed.get("rejected") else "ok"
+    elif response:
+        outcome = "parse_error"
+    else:
+        outcome = "http_error" if info.get("http_status") else "network_error"
+
+    ttft = None
+    if response and "usage_event" in response:  # streamed
+        ttft = response.get("ttft")
+        response = response["usage_event"]
+    telemetry.record(
+        kind, model, outcome,
+        latency=time.time() - started - info.get("queued", 0.0),
+        attempts=info.get("attempts", 1),
+        http_status=info.get("http_status"),
+        usage=_usage_from_response(response) if response else None,
+        queued=info.get("queued", 0.0),
+        ttft=ttft,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Streaming (SSE) with early rejection abort
+# ---------------------------------------------------------------------------
+
+_EARLY_REJECT = re.compile(r'^\s*(?:```(?:json)?\s*)?\{\s*"rejected"\s*:\s*true\b')
+_EARLY_REASON = re.compile(r'"reason"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_EARLY_CHECK_CHARS = 600  # verdict is expected in the first tokens (schema puts it first)
+
+
+def _gemini_chunk_text(event):
+    candidates = event.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts if not p.get("thought"))
+
+
+def _openrouter_chunk_text(event):
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def _early_rejection(text):
+    """Причина відхилення, якщо відповідь почалась з {"rejected": true}; інакше None."""
+    match = _EARLY_REJECT.match(text)
+    if not match:
         return None
+    reason = _EARLY_REASON.search(text, match.end())
+    if reason:
+        try:
+            return json.loads(f'"{reason.group(1)}"')
+        except json.JSONDecodeError:
+            return reason.group(1)
+    # Give the reason a few more tokens, then stop anyway
+    return "невідома причина" if len(text) - match.end() > 300 else None
 
 
-def _parse_json_response(text):
-    """Парсить JSON-відповідь від моделі."""
-    text = re.sub(r"^```json\s*", "", text.strip())
+def _consume_sse(resp, sent_at, extract_text):
+    """Читає SSE-потік: збирає текст, міряє TTFT, обриває з'єднання на ранньому reject."""
+    chunks = []
+    head = ""
+    ttft = None
+    usage_event = {}
+    finish_reason = None
+    for raw_line in resp:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue  # keep-alive comments (": OPENROUTER PROCESSING"), event names
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        if event.get("error"):
+            raise RuntimeError(f"stream error: {str(event['error'])[:150]}")
+        if event.get("usageMetadata") or event.get("usage"):
+            usage_event = event
+        finish_reason = _finish_reason(event) or finish_reason
+
+        text = extract_text(event)
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.time() - sent_at
+        chunks.append(text)
+
+        if len(head) < _EARLY_CHECK_CHARS:
+            head += text
+            reason = _early_rejection(head)
+            if reason is not None:
+                # Leaving the with-block closes the connection and stops generation
+                return {"text": head, "ttft": ttft, "total": time.time() - sent_at,
+                        "usage_event": usage_event, "rejected_reason": reason, "finish_reason": None}
+
+    return {"text": "".join(chunks), "ttft": ttft, "total": time.time() - sent_at,
+            "usage_event": usage_event, "rejected_reason": None, "finish_reason": finish_reason}
+
+
+def _parse_streamed(streamed, label, estimated_input):
+    """Результат _consume_sse → dict рерайту (з _usage та TTFT) або None."""
+    if not streamed:
+        return None
+    ttft = streamed["ttft"]
+    if ttft is None:
+        print(f"   [WARN] {label}: empty stream")
+        return None
+
+    if streamed["rejected_reason"] is not None:
+        print(f"   🚫 AI rejected: {streamed['rejected_reason']} "
+              f"(stream aborted after {streamed['total']:.1f}s, TTFT {ttft:.1f}s)")
+        parsed = {"rejected": True, "reason": streamed["rejected_reason"]}
+    else:
+        print(f"   ⚡ TTFT {ttft:.1f}s, total {streamed['total']:.1f}s")
+        parsed = _parse_json_response(streamed["text"], streamed["finish_reason"])
+
+    parsed = _attach_usage(parsed, streamed["usage_event"], label, estimated_input)
+    if parsed:
+        parsed["_usage"]["ttft_seconds"] = round(ttft, 2)
+        parsed["_usage"]["stream_seconds"] = round(streamed["total"], 2)
+    return parsed
+
+
+# ---------------------------------------------------------------------------
+# Gemini Batch Mode (one async job for a whole process run)
+# ---------------------------------------------------------------------------
+
+
+def rewrite_articles_batch(jobs, poll_interval=None, timeout=None):
+    """
+    Рерайт кількох статей одним асинхронним Gemini batch job.
+    jobs: список kwargs-dict для rewrite_article (як у rewrite_many).
+    Повертає список результатів у порядку jobs. Кешовані статті в batch не йдуть;
+    статті без відповіді з batch (помилка job, timeout) добираються через rewrite_many.
+    """
+    if not jobs:
+        return []
+    keys = gemini_api_keys()
+    if not keys:
+        print("[WARN] GEMINI_API_KEY not set, batch mode unavailable — using interactive calls")
+        return rewrite_many(jobs)
+    api_key = keys[0]  # the batch job and its polling are bound to one project key
+
+    results = [None] * len(jobs)
+    pending = {}  # metadata key -> (index, cache_key, user_prompt)
+    for i, job in enumerate(jobs):
+        content_type = job.get("content_type") or ("manual" if job.get("force_relevant") else "news")
+        user_prompt = _build_user_prompt(
+            job["title"], job.get("summary", ""), job["source_url"], job.get("content", ""), content_type
+        )
+        cache_key = _rewrite_cache_key(user_prompt, job.get("force_relevant", False))
+        cached = _get_cached_rewrite(cache_key)
+        if cached is not None:
+            print(f"   [CACHE HIT] {job['title'][:60]}")
+            results[i] = cached
+            continue
+        if job.get("force_relevant"):
+            user_prompt += _FORCE_RELEVANT_NOTE
+        pending[f"job-{i}"] = (i, cache_key, user_prompt, content_type)
+
+    if not pending:
+        return results
+
+    batch_started = time.time()
+    # Batch jobs run on GEMINI_MODEL: explicit thinking budget on top of the answer cap
+    thinking = REWRITE_ROUTES["standard"]["thinking_budget"]
+    responses = _run_gemini_batch(
+        api_key,
+        {
+            key: _gemini_payload(prompt, _max_output_tokens(estimate_tokens(prompt), ctype) + thinking,
+                                 thinking_budget=thinking)
+            for key, (_, _, prompt, ctype) in pending.items()
+        },
+        poll_interval=poll_interval or BATCH_POLL_INTERVAL_SECONDS,
+        timeout=timeout or BATCH_TIMEOUT_SECONDS,
+    )
+
+    leftovers = []
+    for key, (i, cache_key, prompt, _) in pending.items():
+        response = responses.get(key)
+        parsed = None
+        if response:
+            try:
+                parsed = _parse_json_response(response["candidates"][0]["content"]["parts"][0]["text"],
+                                              _finish_reason(response))
+                parsed = _attach_usage(parsed, response, f"{GEMINI_MODEL} (batch)",
+                                       estimate_tokens(GEMINI_SYSTEM_PROMPT + prompt))
+            except (KeyError, IndexError, TypeError) as e:
+                print(f"   [WARN] Batch response parse error ({key}): {e}")
+        if response is not None:
+            _record_call(f"{GEMINI_MODEL} (batch)", batch_started, {"http_status": 200}, parsed, response)
+        if parsed:
+            _set_cached_rewrite(cache_key, parsed)
+            results[i] = parsed
+        else:
+            leftovers.append(i)
+
+    if leftovers:
+        print(f"[INFO] {len(leftovers)} articles missing from batch output — retrying interactively")
+        for i, result in zip(leftovers, rewrite_many([jobs[i] for i in leftovers])):
+            results[i] = result
+
+    return results
+
+
+def _run_gemini_batch(api_key, requests_by_key, poll_interval, timeout):
+    """Створює inline batch job, чекає завершення. Повертає {key: GenerateContentResponse}."""
+    payload = {
+        "batch": {
+            "display_name": f"konopla-rewrite-{int(time.time())}",
+            "input_config": {
+                "requests": {
+                    "requests": [
+                        {"request": req, "metadata": {"key": key}}
+                        for key, req in requests_by_key.items()
+                    ]
+                }
+            },
+        }
+    }
+
+    print(f"   📦 Submitting Gemini batch: {len(requests_by_key)} requests")
+    operation = _api_request_with_retry(
+        f"{GEMINI_BATCH_URL}?key={api_key}", payload,
+        {"Content-Type": "application/json"}, "Gemini batch",
+    )
+    if not operation or not operation.get("name"):
+        print("   [WARN] Gemini batch submission failed")
+        return {}
+
+    name = operation["name"]
+    started = time.time()
+    while not operation.get("done"):
+        if time.time() - started > timeout:
+            print(f"   [WARN] Gemini batch {name} timed out after {timeout}s")
+            return {}
+        time.sleep(poll_interval)
+        polled = _api_get(f"{GEMINI_API_BASE}/{name}?key={api_key}", "Gemini batch poll")
+        if polled:
+            operation = polled
+            state = (operation.get("metadata") or {}).get("state", "")
+            print(f"   ⏳ Batch {name}: {state or 'running'} ({time.time() - started:.0f}s)")
+
+    if operation.get("error"):
+        print(f"   [WARN] Gemini batch failed: {str(operation['error'])[:200]}")
+        return {}
+
+    # Inline results: response.inlinedResponses.inlinedResponses[] (older API: dest.inlinedResponses)
+    response = operation.get("response") or {}
+    inlined = response.get("inlinedResponses") or (operation.get("metadata") or {}).get("output", {}).get("inlinedResponses") or {}
+    items = inlined.get("inlinedResponses", []) if isinstance(inlined, dict) else inlined
+
+    by_key = {}
+    for item in items:
+        key = (item.get("metadata") or {}).get("key")
+        if key and item.get("response"):
+            by_key[key] = item["response"]
+        elif key:
+            print(f"   [WARN] Batch item {key} error: {str(item.get('error', ''))[:150]}")
+    print(f"   📦 Batch {name} done: {len(by_key)}/{len(requests_by_key)} responses in {time.time() - started:.0f}s")
+    return by_key
+
+
+def _api_get(url, label):
+    """HTTP GET з одним retry. Повертає розпарсений JSON або None."""
+    for attempt in range(2):
+        try:
+            req = urllib.request.Request(url, headers={"Accept": "application/json"})
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except Exception as e:
+            print(f"   [WARN] {label} failed (attempt {attempt+1}): {e}")
+            if attempt == 0:
+                time.sleep(3)
+    return None
+
+
+ALLOWED_CATEGORIES = [
+    "бізнес", "агро", "текстиль", "будівництво", "харчова",
+    "екологія", "законодавство", "відео", "наука", "косметика",
+    "біопластик", "автопром", "енергетика", "інше",
+]
+
+# Provider-side structured output (Gemini responseSchema, OpenAPI subset).
+# "rejected" goes first so a rejection is visible in the first tokens.
+REWRITE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "rejected": {"type": "BOOLEAN"},
+        "reason": {"type": "STRING"},
+        "title": {"type": "STRING"},
+        "summary": {"type": "STRING"},
+        "content": {"type": "STRING"},
+        "category": {"type": "STRING", "enum": ALLOWED_CATEGORIES},
+        "tags": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "image_query": {"type": "STRING"},
+        "telegram_hook": {"type": "STRING"},
+        "threads_hook": {"type": "STRING"},
+    },
+    "required": ["rejected"],
+    "propertyOrdering": [
+        "rejected", "reason", "title", "summary", "content", "category",
+        "tags", "image_query", "telegram_hook", "threads_hook",
+    ],
+}
+
+
+def _close_truncated_json(text):
+    """Дописує закриваючі лапки/дужки до обрізаного JSON (відповідь уперлась у maxOutputTokens)."""
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += "\\" if escaped else ""
+        text += '"'
+    text = text.rstrip()
+    # Dangling key or separator at the cut: drop it
+    text = re.sub(r',\s*"[^"]*"\s*:?\s*$', "", text)
+    text = re.sub(r"[,:]\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def _repair_json(text):
+    """Толерантний розбір: текст навколо JSON, trailing commas, сирі переноси рядків, обрізаний кінець."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    end = text.rfind("}")
+    attempts = [text[:end + 1]] if end >= 0 else []
+    attempts.append(text)
+
+    for attempt in attempts:
+        attempt = re.sub(r",\s*([}\]])", r"\1", attempt)
+        for candidate in (attempt, _close_truncated_json(attempt)):
+            try:
+                data = json.loads(candidate, strict=False)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                return data
+    return None
+
+
+_TRUNCATED_FINISH_REASONS = {"MAX_TOKENS", "LENGTH"}
+
+
+def _finish_reason(response):
+    """finishReason (Gemini) або finish_reason (OpenRouter) першого кандидата, у верхньому регістрі."""
+    for key, field in (("candidates", "finishReason"), ("choices", "finish_reason")):
+        items = response.get(key) or []
+        if items and items[0].get(field):
+            return str(items[0][field]).upper()
+    return None
+
+
+def _parse_json_response(text, finish_reason=None):
+    """Парсить JSON-відповідь від моделі (з tolerant repair для битого JSON).
+    Відповідь, обрізану лімітом токенів (finish_reason MAX_TOKENS/length), не ремонтуємо:
+    останнє поле могло бути дописане лише наполовину."""
+    text = re.sub(r"^```(?:json)?\s*", "", text.strip())
     text = re.sub(r"\s*```$", "", text.strip())
 
     try:
         article_data = json.loads(text)
     except json.JSONDecodeError as e:
-        print(f"   [WARN] JSON parse error: {e}")
+        if finish_reason in _TRUNCATED_FINISH_REASONS:
+            print(f"   [WARN] Response cut off by the output token limit ({finish_reason}), discarding")
+            return None
+        article_data = _repair_json(text)
+        if article_data is None:
+            print(f"   [WARN] JSON parse error: {e}")
+            return None
+        print(f"   [WARN] JSON repaired after parse error: {e}")
+
+    if not isinstance(article_data, dict):
+        print(f"   [WARN] Unexpected JSON type: {type(article_data).__name__}")
         return None
 
     # Check if AI rejected the article as irrelevant
@@ -177,18 +1286,15 @@ def _parse_json_response(text):
         reason = article_data.get("reason", "невідома причина")
         print(f"   🚫 AI rejected: {reason}")
         return {"rejected": True, "reason": reason}
+    article_data.pop("rejected", None)
+    article_data.pop("reason", None)
 
     required = ["title", "summary", "content", "category", "tags"]
     if not all(key in article_data for key in required):
         print(f"   [WARN] Missing fields: {list(article_data.keys())}")
         return None
 
-    allowed_categories = {
-        "бізнес", "агро", "текстиль", "будівництво", "харчова",
-        "екологія", "законодавство", "відео", "наука", "косметика",
-        "біопластик", "автопром", "енергетика", "інше"
-    }
-    if article_data.get("category", "інше") not in allowed_categories:
+    if article_data.get("category", "інше") not in ALLOWED_CATEGORIES:
         print(f"   [WARN] Invalid category '{article_data['category']}', defaulting to 'інше'")
         article_data["category"] = "інше"
 
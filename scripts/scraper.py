@@ -11,6 +11,8 @@ from urllib.error import HTTPError, URLError
 from urllib.parse import urlparse, unquote, urljoin
 from urllib.request import Request, urlopen
 
+import html_archive
+
 _SKIP_TAGS = frozenset({"script", "style", "nav", "header", "footer", "aside", "form", "noscript", "iframe", "svg"})
 
 # Content-indicative class/id keywords for div-based content detection
@@ -255,11 +257,16 @@ def _fetch_html(url: str, timeout: int = 15) -> str | None:
         })
         with urlopen(req, timeout=timeout, context=ctx) as resp:
             charset = resp.headers.get_content_charset() or "utf-8"
-            return resp.read().decode(charset, errors="replace")
+            raw = resp.read()
+            final_url = resp.url or url
     except (HTTPError, URLError, TimeoutError, OSError, ValueError) as e:
         print(f"   [WARN] HTTP fetch failed: {e}")
         return None
 
+    if html_archive.is_enabled():
+        html_archive.store(url, raw, charset=charset, final_url=final_url)
+    return raw.decode(charset, errors="replace")
+
 
 def scrape_article(url: str, timeout: int = 15) -> str | None:
     """Fetch and extract article text from a URL. Returns None on any error.
@@ -290,6 +297,14 @@ def scrape_article_full(url: str, timeout: int = 15) -> dict | None:
     if not html:
         return None
 
+    return extract_article(html, url)
+
+
+def extract_article(html: str, url: str = "") -> dict | None:
+    """Extract article text, images and metadata from already fetched HTML.
+
+    Shared by live scraping and offline re-extraction from the HTML archive.
+    """
     try:
         parser = _ArticleParser(base_url=url)
         parser.feed(html)
@@ -316,8 +331,76 @@ def scrape_article_full(url: str, timeout: int = 15) -> dict | None:
     }
 
 
+def reextract_archive(url: str | None = None, all_versions: bool = False, out_path: str | None = None) -> int:
+    """Re-run extraction over archived HTML without touching the network.
+
+    Prints per-page stats and optionally writes JSONL results for offline
+    benchmarking / regression-testing of the extractor.
+    """
+    import json
+    import time
+
+    records = html_archive.iter_records(url=url, all_versions=all_versions)
+    if not records:
+        print(f"No archived pages in {html_archive.archive_dir()}")
+        return 1
+
+    out = open(out_path, "w", encoding="utf-8") if out_path else None
+    ok = empty = errors = 0
+    total_chars = 0
+    start = time.time()
+    try:
+        for rec in records:
+            try:
+                html = html_archive.load(rec)
+            except (OSError, RuntimeError) as e:
+                print(f"  [ERROR] {rec.get('canonical_url', '')[:80]}: {e}")
+                errors += 1
+                continue
+            result = extract_article(html, rec.get("url", ""))
+            chars = len(result["text"]) if result else 0
+            if result:
+                ok += 1
+                total_chars += chars
+            else:
+                empty += 1
+            print(f"  {chars:>5} chars  {len(result['images']) if result else 0:>2} imgs  {rec.get('canonical_url', '')[:80]}")
+            if out:
+                out.write(json.dumps({
+                    "canonical_url": rec.get("canonical_url", ""),
+                    "fetched_at": rec.get("fetched_at", ""),
+                    "sha256": rec.get("sha256", ""),
+                    "result": result,
+                }, ensure_ascii=False) + "\n")
+    finally:
+        if out:
+            out.close()
+
+    duration = time.time() - start
+    avg = total_chars // ok if ok else 0
+    print(f"\nRe-extracted {len(records)} pages in {duration:.1f}s: "
+          f"{ok} ok, {empty} empty, {errors} errors, avg {avg} chars")
+    return 0
+
+
 if __name__ == "__main__":
-    test_url = sys.argv[1] if len(sys.argv) > 1 else "https://hemptoday.net/"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Article scraper")
+    parser.add_argument("url", nargs="?", default="",
+                        help="URL to scrape (live mode) or to filter the archive (--reextract)")
+    parser.add_argument("--reextract", action="store_true",
+                        help="Re-run extraction over the raw HTML archive instead of fetching")
+    parser.add_argument("--all-versions", action="store_true",
+                        help="With --reextract: include every archived fetch, not only the latest per URL")
+    parser.add_argument("--out", default="",
+                        help="With --reextract: write JSONL results to this file")
+    args = parser.parse_args()
+
+    if args.reextract:
+        sys.exit(reextract_archive(url=args.url or None, all_versions=args.all_versions, out_path=args.out or None))
+
+    test_url = args.url or "https://hemptoday.net/"
     result = scrape_article_full(test_url)
     if result:
         print(f"Scraped {len(result['text'])} chars from {test_url}")
@@ -8,6 +8,8 @@ import urllib.request
 import urllib.error
 import time
 
+import quota
+from config import TELEGRAM_QUOTA_MAX_WAIT
 
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
@@ -94,6 +96,9 @@ def _send_photo_file(url, chat_id, photo_path, caption, parse_mode="HTML"):
     with open(photo_path, "rb") as f:
         file_data = f.read()
 
+    if not _wait_for_chat_quota(chat_id):
+        return False
+
     # Build multipart body
     body = b""
     # chat_id field
@@ -231,9 +236,21 @@ def edit_message_text(chat_id, message_id, new_text, parse_mode="HTML"):
     return _send_request(url, payload)
 
 
+def _wait_for_chat_quota(chat_id):
+    """Чекає на вільний слот у журналі квот для чату. False — не раніше ніж за TELEGRAM_QUOTA_MAX_WAIT."""
+    if quota.acquire("telegram", str(chat_id), max_wait=TELEGRAM_QUOTA_MAX_WAIT):
+        return True
+    ready = quota.available_at("telegram", str(chat_id))
+    print(f"[WARN] Telegram chat quota: next message at {ready:%H:%M:%S} UTC, not sent")
+    return False
+
+
 def _send_request_raw(url, payload):
     """Відправляє запит і повертає повну відповідь JSON."""
     data = json.dumps(payload).encode("utf-8")
+    chat_id = payload.get("chat_id")
+    if chat_id and not _wait_for_chat_quota(chat_id):
+        return None
 
     for attempt in range(3):
         try:
@@ -254,6 +271,8 @@ def _send_request_raw(url, payload):
                     retry_after = json.loads(error_body).get("parameters", {}).get("retry_after", 10)
                 except Exception:
                     pass
+                if chat_id:
+                    quota.exhaust("telegram", str(chat_id), retry_after=retry_after)
                 time.sleep(retry_after)
             else:
                 time.sleep(3)
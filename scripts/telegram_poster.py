@@ -101,8 +101,8 @@ def get_photo_path(fm):
     if not image:
         return None, None
 
-    # Local Gemini-generated image
-    if image.startswith('/images/generated/'):
+    # Local image: Gemini-generated, localized source image or upload
+    if image.startswith('/images/'):
         local_path = os.path.join(PROJECT_ROOT, "static", image.lstrip('/'))
         if os.path.exists(local_path):
             return local_path, None
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+telemetry.py — Структурований журнал LLM-викликів (рерайт, тріаж, генерація зображень).
+
+Кожен виклик — один JSON-рядок у data/llm_telemetry.jsonl:
+  {ts, kind, model, outcome, http_status, attempts, latency_s, queued_s, ttft_s,
+   input_tokens, output_tokens, cached_tokens, thinking_tokens}
+outcome: ok | rejected | parse_error | http_error | network_error | no_image
+
+Usage:
+  python scripts/telemetry.py                 # зведення за весь журнал
+  python scripts/telemetry.py --hours 24      # лише останні 24 години
+  python scripts/telemetry.py --kind rewrite
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import LLM_TELEMETRY_FILE, LLM_TELEMETRY_MAX_BYTES, MODEL_PRICES_USD_PER_1M
+
+_lock = threading.Lock()
+
+
+def record(kind, model, outcome, latency, attempts=1, http_status=None, usage=None,
+           queued=0.0, ttft=None):
+    """Дописує запис у журнал. Помилки запису не ламають пайплайн."""
+    usage = usage or {}
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "kind": kind,
+        "model": model,
+        "outcome": outcome,
+        "http_status": http_status,
+        "attempts": attempts,
+        "latency_s": round(latency, 3),
+        "queued_s": round(queued, 3),
+        "ttft_s": round(ttft, 3) if ttft is not None else None,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cached_tokens": usage.get("cached_tokens", 0),
+        "thinking_tokens": usage.get("thinking_tokens", 0),
+    }
+    try:
+        with _lock:
+            os.makedirs(os.path.dirname(LLM_TELEMETRY_FILE), exist_ok=True)
+            with open(LLM_TELEMETRY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if os.path.getsize(LLM_TELEMETRY_FILE) > LLM_TELEMETRY_MAX_BYTES:
+                _truncate_oldest()
+    except OSError as e:
+        print(f"   [WARN] Telemetry write failed: {e}")
+
+
+def _truncate_oldest():
+    with open(LLM_TELEMETRY_FILE, encoding="utf-8") as f:
+        lines = f.readlines()
+    tmp_path = f"{LLM_TELEMETRY_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines[len(lines) // 2:])
+    os.replace(tmp_path, LLM_TELEMETRY_FILE)
+
+
+def load_entries(hours=None, kind=None):
+    if not os.path.exists(LLM_TELEMETRY_FILE):
+        return []
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat() if hours else ""
+    entries = []
+    with open(LLM_TELEMETRY_FILE, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("ts", "") < cutoff or (kind and entry.get("kind") != kind):
+                continue
+            entries.append(entry)
+    return entries
+
+
+def cost_usd(entry):
+    """Вартість виклику за MODEL_PRICES_USD_PER_1M (кешовані токени — за cached-ціною)."""
+    price = MODEL_PRICES_USD_PER_1M.get(entry.get("model", "").replace(" (batch)", ""))
+    if not price:
+        return 0.0
+    cached = entry.get("cached_tokens", 0)
+    fresh = max(0, entry.get("input_tokens", 0) - cached)
+    output = entry.get("output_tokens", 0) + entry.get("thinking_tokens", 0)
+    cost = fresh * price["input"] + cached * price.get("cached", price["input"]) + output * price["output"]
+    if entry.get("model", "").endswith(" (batch)"):
+        cost /= 2  # Batch Mode is billed at 50%
+    return cost / 1_000_000
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(entries):
+    """{(kind, model): stats} — кількість, outcomes, p50/p95 латентності, токени, вартість."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault((entry.get("kind", ""), entry.get("model", "")), []).append(entry)
+
+    summary = {}
+    for key, items in sorted(groups.items()):
+        outcomes = {}
+        for e in items:
+            outcomes[e.get("outcome", "")] = outcomes.get(e.get("outcome", ""), 0) + 1
+        latencies = [e["latency_s"] for e in items if e.get("outcome") in ("ok", "rejected")]
+        ttfts = [e["ttft_s"] for e in items if e.get("ttft_s") is not None]
+        summary[key] = {
+            "calls": len(items),
+            "outcomes": outcomes,
+            "p50_latency": _percentile(latencies, 0.5),
+            "p95_latency": _percentile(latencies, 0.95),
+            "p50_ttft": _percentile(ttfts, 0.5),
+            "attempts": sum(e.get("attempts", 1) for e in items),
+            "input_tokens": sum(e.get("input_tokens", 0) for e in items),
+            "output_tokens": sum(e.get("output_tokens", 0) + e.get("thinking_tokens", 0) for e in items),
+            "cost_usd": sum(cost_usd(e) for e in items),
+        }
+    return summary
+
+
+def _fmt_seconds(value):
+    return f"{value:.1f}s" if value is not None else "—"
+
+
+def print_summary(summary):
+    if not summary:
+        print("[INFO] No telemetry entries")
+        return
+    header = f"{'kind':<8} {'model':<40} {'calls':>5} {'ok':>4} {'rej':>4} {'err':>4} " \
+             f"{'p50':>7} {'p95':>7} {'ttft50':>7} {'tok in':>9} {'tok out':>9} {'cost $':>8}"
+    print(header)
+    print("-" * len(header))
+    total = 0.0
+    for (kind, model), s in summary.items():
+        ok = s["outcomes"].get("ok", 0)
+        rejected = s["outcomes"].get("rejected", 0)
+        print(f"{kind:<8} {model[:40]:<40} {s['calls']:>5} {ok:>4} {rejected:>4} "
+              f"{s['calls'] - ok - rejected:>4} {_fmt_seconds(s['p50_latency']):>7} "
+              f"{_fmt_seconds(s['p95_latency']):>7} {_fmt_seconds(s['p50_ttft']):>7} "
+              f"{s['input_tokens']:>9} {s['output_tokens']:>9} {s['cost_usd']:>8.4f}")
+        total += s["cost_usd"]
+    print(f"\nTotal cost (paid-tier equivalent): ${total:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize LLM call telemetry")
+    parser.add_argument("--hours", type=float, default=None, help="Only entries from the last N hours")
+    parser.add_argument("--kind", default=None, choices=["rewrite", "triage", "image"])
+    args = parser.parse_args()
+    print_summary(summarize(load_entries(hours=args.hours, kind=args.kind)))
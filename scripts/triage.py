@@ -0,0 +1,147 @@
+"""
+triage.py — Дешевий LLM-тріаж кандидатів на етапі discover.
+
+Один компактний запит на 20–50 кандидатів (заголовок + прев'ю) замість
+повного rewrite-запиту на кожну статтю. Повертає релевантність, категорію
+та прапорець reject; run_discover зберігає це в candidates.json (поле "triage")
+і враховує релевантність у relevance_score. Вердикт лише ранжує й позначає
+кандидатів: обрані редактором статті run_process обробляє навіть з reject=true.
+"""
+
+import json
+import re
+import time
+
+from config import TRIAGE_BATCH_SIZE, TRIAGE_REJECT_BELOW
+from rewriter import (
+    ALLOWED_CATEGORIES, GEMINI_API_URL, GEMINI_MODEL, _api_request_with_retry, _gemini_pool, _record_call,
+)
+
+# id + relevance + Cyrillic category + reason of up to 8 Ukrainian words ≈ 60–80 tokens
+_TOKENS_PER_ITEM = 120
+_SEPARATOR = re.compile(r"\s*,?\s*")
+
+TRIAGE_PROMPT = """Ти — редактор порталу Konopla.UA про промислові коноплі (industrial hemp).
+Нижче список новин-кандидатів (id, заголовок, початок тексту). Для КОЖНОГО оціни:
+- relevance: 0.0–1.0 — наскільки стаття реально про промислові коноплі / конопляну індустрію
+- category: одна з: {categories}
+- reject: true якщо стаття НЕ про промислові коноплі, про наркотики/марихуану/рекреаційний канабіс, кримінал, або це реклама
+- reason: до 8 слів, чому
+
+Поверни СТРОГО JSON-масив без markdown:
+[{{"id": "...", "relevance": 0.0, "category": "...", "reject": false, "reason": "..."}}]
+
+Кандидати:
+{items}"""
+
+
+def _format_items(candidates):
+    lines = []
+    for c in candidates:
+        preview = re.sub(r"\s+", " ", c.get("content_preview") or c.get("summary") or "")[:200]
+        title = re.sub(r"\s+", " ", c.get("title", ""))[:160]
+        lines.append(f"[{c['id']}] {title} — {preview}")
+    return "\n".join(lines)
+
+
+def _complete_items(text):
+    """Цілі елементи з обрізаного JSON-масиву (відповідь уперлась у maxOutputTokens)."""
+    decoder = json.JSONDecoder()
+    items = []
+    pos = text.find("[") + 1
+    while pos > 0:
+        pos = _SEPARATOR.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "]":
+            break
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+    return items
+
+
+def _parse_triage(text, known_ids):
+    """Парсить JSON-масив тріажу. Невідомі id та биті записи ігноруються;
+    з обрізаного масиву беруться цілі елементи."""
+    text = re.sub(r"^```(?:json)?\s*", "", text.strip())
+    text = re.sub(r"\s*```$", "", text.strip())
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        items = _complete_items(text)
+        print(f"   [WARN] Triage JSON parse error: {e} — kept {len(items)} complete items")
+    if isinstance(items, dict):
+        items = items.get("items", [])
+
+    verdicts = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or item.get("id") not in known_ids:
+            continue
+        try:
+            relevance = max(0.0, min(1.0, float(item.get("relevance", 0))))
+        except (TypeError, ValueError):
+            relevance = 0.0
+        category = item.get("category", "інше")
+        verdicts[item["id"]] = {
+            "relevance": round(relevance, 2),
+            "category": category if category in ALLOWED_CATEGORIES else "інше",
+            "reject": bool(item.get("reject")) or relevance < TRIAGE_REJECT_BELOW,
+            "reason": str(item.get("reason", ""))[:120],
+            "model": GEMINI_MODEL,
+        }
+    return verdicts
+
+
+def triage_candidates(candidates, batch_size=None):
+    """
+    Тріаж кандидатів пачками по batch_size (20–50) в одному запиті на пачку.
+    Повертає {candidate_id: {relevance, category, reject, reason, model}}.
+    Кандидати без вердикту (помилка API) просто відсутні у результаті.
+    """
+    pool = _gemini_pool()
+    if not pool:
+        print("[INFO] GEMINI_API_KEY not set, skipping LLM triage")
+        return {}
+
+    size = max(1, batch_size or TRIAGE_BATCH_SIZE)
+    verdicts = {}
+    for start in range(0, len(candidates), size):
+        chunk = candidates[start:start + size]
+        prompt = TRIAGE_PROMPT.format(
+            categories=", ".join(ALLOWED_CATEGORIES), items=_format_items(chunk)
+        )
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": 0.1,
+                "maxOutputTokens": _TOKENS_PER_ITEM * len(chunk) + 256,
+                "responseMimeType": "application/json",
+                # Classification needs no reasoning tokens; keep the call cheap
+                "thinkingConfig": {"thinkingBudget": 0},
+            },
+        }
+        print(f"   🔎 Triage: {len(chunk)} candidates in one request")
+        started = time.time()
+        info = {}
+        result = _api_request_with_retry(
+            GEMINI_API_URL, payload,
+            {"Content-Type": "application/json"}, "Gemini triage",
+            key_pool=pool, call_info=info,
+        )
+        if not result:
+            _record_call(GEMINI_MODEL, started, info, None, kind="triage")
+            continue
+        try:
+            text = result["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError) as e:
+            print(f"   [WARN] Triage response parse error: {e}")
+            _record_call(GEMINI_MODEL, started, info, None, result, kind="triage")
+            continue
+        chunk_verdicts = _parse_triage(text, {c["id"] for c in chunk})
+        _record_call(GEMINI_MODEL, started, info, chunk_verdicts or None, result, kind="triage")
+        verdicts.update(chunk_verdicts)
+
+    rejected = sum(1 for v in verdicts.values() if v["reject"])
+    print(f"[INFO] Triage: {len(verdicts)}/{len(candidates)} judged, {rejected} rejected")
+    return verdicts
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+unsplash_cache.py — Кеш результатів пошуку Unsplash і пул фото за категоріями.
+
+data/unsplash_cache.json:
+  {"queries": {"<нормалізований запит>": {"query", "fetched_at", "served", "results": [image_data...]}}}
+
+Запит нормалізується як у image_reuse (терміни без стоп-слів, відсортовані), тож
+"Hemp fields" і "hemp field" — один запис. Результати живуть UNSPLASH_CACHE_TTL_HOURS
+(порожня відповідь — UNSPLASH_EMPTY_TTL_HOURS) і віддаються по колу, щоб сусідні
+статті не отримували те саме фото.
+
+Пул категорій — це ті самі записи для CATEGORY_IMAGE_QUERIES; refill_pool()
+оновлює прострочені поза критичним шляхом (discover-workflow), тож fallback
+images.get_unsplash_image відповідає з локальних даних без другого запиту.
+
+Usage:
+  python scripts/unsplash_cache.py --refill     # оновити до UNSPLASH_POOL_REFILL_MAX категорій
+  python scripts/unsplash_cache.py --status
+"""
+
+import argparse
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import (
+    CATEGORY_IMAGE_QUERIES, UNSPLASH_CACHE_FILE, UNSPLASH_CACHE_TTL_HOURS, UNSPLASH_EMPTY_TTL_HOURS,
+    UNSPLASH_CACHE_MAX_QUERIES, UNSPLASH_POOL_REFILL_MAX,
+)
+from image_reuse import query_terms
+from utils import load_json, save_json
+
+_lock = threading.Lock()
+
+
+def normalize_query(query):
+    return " ".join(query_terms(query))
+
+
+def _expires_at(entry):
+    hours = UNSPLASH_CACHE_TTL_HOURS if entry.get("results") else UNSPLASH_EMPTY_TTL_HOURS
+    fetched = datetime.fromisoformat(entry["fetched_at"])
+    return fetched + timedelta(hours=hours)
+
+
+def _is_fresh(entry, margin_hours=0):
+    try:
+        return _expires_at(entry) - timedelta(hours=margin_hours) > datetime.now(timezone.utc)
+    except (KeyError, ValueError):
+        return False
+
+
+def take(query):
+    """
+    Наступне фото з кешу для запиту.
+    Повертає (hit, image_data): hit=False — запису немає або він прострочений (потрібен
+    живий пошук); hit=True, image_data=None — Unsplash нічого не знайшов (кешовано).
+    """
+    key = normalize_query(query)
+    with _lock:
+        cache = load_json(UNSPLASH_CACHE_FILE, {"queries": {}})
+        entry = cache.get("queries", {}).get(key)
+        if not entry or not _is_fresh(entry):
+            return False, None
+        results = entry.get("results", [])
+        if not results:
+            return True, None
+        photo = results[entry.get("served", 0) % len(results)]
+        entry["served"] = entry.get("served", 0) + 1
+        save_json(UNSPLASH_CACHE_FILE, cache)
+    return True, dict(photo)
+
+
+def store(query, results):
+    """Зберігає результати пошуку (найдавніші запити витісняються понад UNSPLASH_CACHE_MAX_QUERIES)."""
+    key = normalize_query(query)
+    with _lock:
+        cache = load_json(UNSPLASH_CACHE_FILE, {"queries": {}})
+        queries = cache.setdefault("queries", {})
+        queries[key] = {
+            "query": query,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "served": 0,
+            "results": results,
+        }
+        if len(queries) > UNSPLASH_CACHE_MAX_QUERIES:
+            pool = {normalize_query(q) for q in CATEGORY_IMAGE_QUERIES.values()}
+            evictable = sorted((e["fetched_at"], k) for k, e in queries.items() if k not in pool)
+            for _, k in evictable[:len(queries) - UNSPLASH_CACHE_MAX_QUERIES]:
+                del queries[k]
+        save_json(UNSPLASH_CACHE_FILE, cache)
+
+
+def refill_pool(max_requests=None):
+    """Оновлює записи категорій, що прострочені або спливають протягом доби. Повертає кількість запитів."""
+    from images import search_unsplash
+
+    cache = load_json(UNSPLASH_CACHE_FILE, {"queries": {}}).get("queries", {})
+    stale = [q for q in dict.fromkeys(CATEGORY_IMAGE_QUERIES.values())
+             if not _is_fresh(cache.get(normalize_query(q), {}), margin_hours=24)]
+    budget = UNSPLASH_POOL_REFILL_MAX if max_requests is None else max_requests
+    done = 0
+    for query in stale[:budget]:
+        results = search_unsplash(query)
+        if results is None:
+            break  # no key, rate limited or API down: try again next run
+        store(query, results)
+        done += 1
+        print(f"   🗂️ Pool '{query}': {len(results)} photos")
+    print(f"[INFO] Unsplash pool: {done} refreshed, {max(0, len(stale) - done)} still stale")
+    return done
+
+
+def _print_status():
+    cache = load_json(UNSPLASH_CACHE_FILE, {"queries": {}}).get("queries", {})
+    pool = {normalize_query(q): q for q in CATEGORY_IMAGE_QUERIES.values()}
+    for key, query in pool.items():
+        entry = cache.get(key)
+        state = "missing" if not entry else ("fresh" if _is_fresh(entry) else "stale")
+        count = len(entry.get("results", [])) if entry else 0
+        print(f"  {query:<40} {state:<8} {count:>3} photos")
+    print(f"  ({len(cache)} cached queries in total)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unsplash search cache and category pool")
+    parser.add_argument("--refill", action="store_true", help="Refresh stale category pool entries")
+    parser.add_argument("--status", action="store_true", help="Show category pool state")
+    args = parser.parse_args()
+    if args.refill:
+        refill_pool()
+    elif args.status:
+        _print_status()
+    else:
+        parser.print_help()
@@ -17,7 +17,8 @@ from datetime import datetime, timedelta, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from config import API_DELAY_SECONDS
+import quota
+from config import API_DELAY_SECONDS, YOUTUBE_UNIT_COSTS
 from rewriter import rewrite_article
 from publisher import create_article_file
 from fetcher import is_drug_related
@@ -116,7 +117,11 @@ def _set_cached_search(query, published_after, results):
 
 
 def youtube_api_request(endpoint, params):
-    """Робить запит до YouTube Data API v3."""
+    """Робить запит до YouTube Data API v3 (units списуються в журналі квот)."""
+    cost = YOUTUBE_UNIT_COSTS.get(endpoint, 1)
+    if quota.try_consume("youtube", cost=cost) > 0:
+        print(f"[QUOTA] YouTube units exhausted until {quota.available_at('youtube', cost=cost):%Y-%m-%d %H:%M} UTC")
+        return None
     params["key"] = YOUTUBE_API_KEY
 
     query_string = "&".join(f"{k}={urllib.parse.quote(str(v))}" for k, v in params.items())
@@ -132,6 +137,9 @@ def youtube_api_request(endpoint, params):
         except urllib.error.HTTPError as e:
             error_body = e.read().decode("utf-8", errors="replace")
             print(f"[ERROR] YouTube API {e.code}: {error_body[:300]}")
+            if e.code == 403 and "quotaExceeded" in error_body:
+                quota.exhaust("youtube", daily=True)
+                return None
             if e.code in (429, 500, 503) and attempt < 2:
                 wait = 2 ** (attempt + 1)
                 print(f"[RETRY] Waiting {wait}s before retry {attempt + 2}/3...")
@@ -234,6 +242,11 @@ def run_youtube_monitor():
         results = _get_cached_search(query, published_after)
         if results is not None:
             print(f"  [CACHE HIT] {len(results)} results")
+        elif quota.wait_time("youtube", cost=YOUTUBE_UNIT_COSTS["search"]) > 0:
+            # Not cached as empty: the query runs again once units are back
+            ready = quota.available_at("youtube", cost=YOUTUBE_UNIT_COSTS["search"])
+            print(f"  [QUOTA] Skipped — YouTube units available again at {ready:%Y-%m-%d %H:%M} UTC")
+            continue
         else:
             results = search_videos(query, published_after, max_results=5)
             _set_cached_search(query, published_after, results)
@@ -322,6 +335,7 @@ def run_youtube_monitor():
                 summary=description[:500],
                 source_url=video_url,
                 content=video_content,
+                content_type="video",
             )
         except Exception as e:
             print(f"  ❌ Rewrite error: {e}")